@@ -1,3 +1,164 @@
-from flask import Flask
+import os
+import threading
 
-application = Flask(__name__)
\ No newline at end of file
+STATIC_MAX_AGE_SECONDS = 365 * 24 * 60 * 60
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+
+def create_app():
+    from flask import Flask
+    from jinja2 import FileSystemBytecodeCache
+
+    from api_service.flask_service import blueprint
+
+    application = Flask(__name__)
+    # Compiled templates persist across restarts, MIRROR_TEMPLATE_CACHE defaults to a per-user temp directory
+    application.jinja_options = dict(application.jinja_options,
+                                     bytecode_cache=FileSystemBytecodeCache(os.environ.get('MIRROR_TEMPLATE_CACHE')))
+
+    _shared('metrics').init_app(application)
+    application.register_blueprint(blueprint)
+    return application
+
+
+def _create_metrics():
+    from api_service.metrics import Metrics
+    # Pre-forked workers share their counts through MIRROR_METRICS_DIR when it's set
+    return Metrics(os.environ.get('MIRROR_METRICS_DIR'))
+
+
+def _create_event_store():
+    from api_service.objects.event_store import EventStore
+    return EventStore()
+
+
+def _create_agenda():
+    from api_service.agenda import Agenda
+    return Agenda(_shared('event_store'))
+
+
+def _create_broadcaster():
+    from api_service.broadcast import Broadcaster
+    # MIRROR_MAX_STREAMS caps open /stream connections, unset means no cap
+    max_streams = os.environ.get('MIRROR_MAX_STREAMS')
+    return Broadcaster(int(max_streams) if max_streams else None)
+
+
+def _create_stream_server():
+    from api_service.stream_server import StreamServer
+    return StreamServer(_shared('broadcaster'), host=os.environ.get('MIRROR_STREAM_HOST', '0.0.0.0'),
+                        port=int(os.environ.get('MIRROR_STREAM_PORT', 0)))
+
+
+def _create_clock_ticker():
+    from api_service.clock_stream import ClockTicker
+    return ClockTicker(_shared('agenda'), _shared('broadcaster'))
+
+
+def _create_calendar_refresher():
+    from api_service.calendar_refresh import CalendarRefresher
+
+    refresher = CalendarRefresher(_shared('event_store'))
+    # Changed calendars reach the displays now rather than on the next minute
+    refresher.add_refresh_listener(_shared('clock_ticker').wake)
+    return refresher
+
+
+def _create_asset_bundle():
+    from api_service.asset_bundle import AssetBundle
+    return AssetBundle(STATIC_FOLDER)
+
+
+# Shared objects are built on first use rather than at import, so importing
+# the package (every worker fork, every test) stays cheap and a process only
+# pays for the subsystems it actually touches
+_FACTORIES = {
+    'application': create_app,
+    'metrics': _create_metrics,
+    'event_store': _create_event_store,
+    'agenda': _create_agenda,
+    'broadcaster': _create_broadcaster,
+    'clock_ticker': _create_clock_ticker,
+    'stream_server': _create_stream_server,
+    'calendar_refresher': _create_calendar_refresher,
+    'asset_bundle': _create_asset_bundle,
+}
+
+_instances = {}
+
+_factory_lock = threading.RLock()
+
+
+def _shared(name):
+    instance = _instances.get(name)
+    if instance is None:
+        with _factory_lock:
+            if name not in _instances:
+                _instances[name] = _FACTORIES[name]()
+            instance = _instances[name]
+    return instance
+
+
+def get_metrics():
+    return _shared('metrics')
+
+
+def get_event_store():
+    return _shared('event_store')
+
+
+def get_agenda():
+    return _shared('agenda')
+
+
+def get_broadcaster():
+    return _shared('broadcaster')
+
+
+def get_stream_server():
+    return _shared('stream_server')
+
+
+def get_clock_ticker():
+    return _shared('clock_ticker')
+
+
+def get_calendar_refresher():
+    return _shared('calendar_refresher')
+
+
+def get_asset_bundle():
+    return _shared('asset_bundle')
+
+
+def __getattr__(name):
+    # The default application, kept importable as api_service.application
+    if name == 'application':
+        return _shared('application')
+    raise AttributeError("module '{0}' has no attribute '{1}'".format(__name__, name))
+
+
+def start_background_workers(sources_path=None):
+    # The clock ticker and the calendar refresher each run on their own thread.
+    # Given MIRROR_STREAM_PORT, displays stream from the evented StreamServer
+    # on that port instead of holding a request thread each on /stream.
+    from api_service.calendar_refresh import load_calendar_sources
+
+    calendar_refresher = _shared('calendar_refresher')
+
+    sources_path = sources_path or os.environ.get('MIRROR_CALENDAR_SOURCES')
+    if sources_path and not calendar_refresher.get_sources():
+        for source in load_calendar_sources(sources_path):
+            calendar_refresher.add_source(source)
+    _shared('clock_ticker').start()
+    calendar_refresher.start()
+    if os.environ.get('MIRROR_STREAM_PORT'):
+        _shared('stream_server').start()
+
+
+def precompile(app=None):
+    app = app or _shared('application')
+    _shared('asset_bundle').build()
+    for template in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template)
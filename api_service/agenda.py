@@ -0,0 +1,57 @@
+import datetime
+import threading
+
+DEFAULT_HORIZON_HOURS = 24
+
+
+def agenda_item(event, now):
+    time_format = "%H:%M" if event.start.date() == now.date() else "%a %H:%M"
+    return {
+        "title": event.title,
+        "start": event.start.strftime(time_format),
+        "end": event.end.strftime("%H:%M"),
+        "source": event.source
+    }
+
+
+class Agenda:
+
+    def __init__(self, store=None, horizon_hours=DEFAULT_HORIZON_HOURS):
+        self._lock = threading.Lock()
+        self._snapshot = (0, ())
+        self._store = store
+        self._horizon_hours = horizon_hours
+        self._refresh_key = None
+
+    def get_version(self):
+        return self._snapshot[0]
+
+    def get_items(self):
+        return self._snapshot[1]
+
+    def get_snapshot(self):
+        return self._snapshot
+
+    def publish(self, items):
+        items = tuple(items)
+        with self._lock:
+            version, current_items = self._snapshot
+            if items == current_items:
+                return version
+            self._snapshot = (version + 1, items)
+            return version + 1
+
+    def refresh(self, now=None):
+        if self._store is None:
+            return self.get_version()
+
+        now = now or datetime.datetime.now()
+
+        # Nothing can have changed unless the store did or a minute has passed
+        refresh_key = (self._store.get_version(), now.replace(second=0, microsecond=0))
+        if refresh_key == self._refresh_key:
+            return self.get_version()
+        self._refresh_key = refresh_key
+
+        events = self._store.get_upcoming(now, self._horizon_hours)
+        return self.publish(agenda_item(event, now) for event in events)
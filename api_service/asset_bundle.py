@@ -0,0 +1,86 @@
+import hashlib
+import os
+import re
+import threading
+
+from markupsafe import Markup
+
+from api_service.compression import compress_variants
+
+ASSET_MIMETYPES = {
+    '.css': "text/css; charset=utf-8",
+    '.js': "application/javascript; charset=utf-8",
+}
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_SPACE_AROUND = re.compile(r'\s*([{};,>])\s*')
+CSS_SPACE_AFTER_COLON = re.compile(r':\s+')
+JS_LINE_COMMENT = re.compile(r'^\s*//.*$', re.M)
+
+
+def minify_css(text):
+    text = CSS_COMMENT.sub('', text)
+    text = CSS_SPACE_AROUND.sub(r'\1', text)
+    text = CSS_SPACE_AFTER_COLON.sub(':', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    # Conservative on purpose: whole-line comments, indentation and blank
+    # lines go, line breaks stay so automatic semicolon insertion is untouched
+    text = JS_LINE_COMMENT.sub('', text)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+class Asset:
+
+    __slots__ = ('filename', 'text', 'fingerprint', 'mimetype', 'variants')
+
+    def __init__(self, filename, text):
+        body = text.encode('utf-8')
+        self.filename = filename
+        self.text = text
+        self.fingerprint = hashlib.sha256(body).hexdigest()[:16]
+        self.mimetype = ASSET_MIMETYPES[os.path.splitext(filename)[1]]
+        self.variants = compress_variants(body)
+
+
+# Minified, fingerprinted and precompressed copies of the static CSS and
+# JavaScript. Built once per process, on startup or on first use.
+class AssetBundle:
+
+    def __init__(self, static_folder):
+        self._static_folder = static_folder
+        self._assets = None
+        self._lock = threading.Lock()
+
+    def build(self):
+        assets = {}
+        for directory, _, filenames in os.walk(self._static_folder):
+            for filename in filenames:
+                extension = os.path.splitext(filename)[1]
+                if extension not in MINIFIERS:
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self._static_folder).replace(os.sep, '/')
+                with open(path, encoding='utf-8') as asset_file:
+                    assets[name] = Asset(name, MINIFIERS[extension](asset_file.read()))
+        self._assets = assets
+        return assets
+
+    def get(self, filename):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self.build()
+        return self._assets.get(filename)
+
+    def get_inline(self, filename):
+        return Markup(self.get(filename).text)
@@ -0,0 +1,94 @@
+import threading
+
+
+# Holds only the latest frame per topic, serialized once and shared by every
+# subscriber. A subscriber that falls behind skips straight to the newest
+# frame of each topic, so intermediate frames are dropped and no per-client
+# backlog can build up.
+#
+# A Subscription blocks its caller until there is something new, so each
+# one served through the WSGI /stream route also holds a server thread and
+# its stack. max_subscribers caps those below the thread pool's size and
+# leaves threads free for ordinary requests; subscribe() returns None once
+# the cap is hit. StreamServer instead fans frames out to every display
+# from one event loop, using get_snapshot and wait_for_change.
+class Broadcaster:
+
+    def __init__(self, max_subscribers=None):
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._frames = {}
+        self._payloads = {}
+        self._subscriber_count = 0
+        self._max_subscribers = max_subscribers
+
+    def publish(self, topic, payload, frame):
+        with self._condition:
+            if topic in self._payloads and self._payloads[topic] == payload:
+                return False
+            self._sequence += 1
+            self._payloads[topic] = payload
+            self._frames[topic] = (self._sequence, frame)
+            self._condition.notify_all()
+            return True
+
+    def get_sequence(self):
+        return self._sequence
+
+    def get_subscriber_count(self):
+        return self._subscriber_count
+
+    def get_max_subscribers(self):
+        return self._max_subscribers
+
+    def set_max_subscribers(self, max_subscribers):
+        self._max_subscribers = max_subscribers
+
+    def subscribe(self):
+        with self._condition:
+            if self._max_subscribers is not None and self._subscriber_count >= self._max_subscribers:
+                return None
+            self._subscriber_count += 1
+        return Subscription(self)
+
+    def _unsubscribe(self):
+        with self._condition:
+            self._subscriber_count -= 1
+
+    def get_snapshot(self):
+        # The current sequence and the latest (sequence, frame) per topic, oldest first
+        with self._condition:
+            return self._sequence, sorted(self._frames.values())
+
+    def wait_for_change(self, seen, timeout=None):
+        # Blocks until the sequence moves past `seen` or the timeout passes, returns the sequence
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != seen, timeout)
+            return self._sequence
+
+    def _wait_for_frames(self, seen, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != seen, timeout)
+            frames = sorted(entry for entry in self._frames.values() if entry[0] > seen)
+            return self._sequence, [frame for sequence, frame in frames]
+
+
+class Subscription:
+
+    __slots__ = ('_broadcaster', '_seen', '_closed')
+
+    def __init__(self, broadcaster):
+        self._broadcaster = broadcaster
+        self._seen = 0
+        self._closed = False
+
+    def next_frames(self, timeout=None):
+        # Blocks until there is something newer than what was last delivered,
+        # an empty list means the timeout passed without a change
+        self._seen, frames = self._broadcaster._wait_for_frames(self._seen, timeout)
+        return frames
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._broadcaster._unsubscribe()
@@ -0,0 +1,334 @@
+import datetime
+import json
+import os
+import re
+
+from api_service.objects.event import Event
+from api_service.objects.recurrence import Recurrence, utc_to_local
+
+ICS = 'ics'
+JSON_LINES = 'jsonl'
+
+
+ICS_DURATION = re.compile(r'^(?P<sign>[+-])?P(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?'
+                          r'(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$')
+
+JSON_DATETIME_FORMATS = ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+
+def format_for_path(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.ics', '.ical', '.ifb'):
+        return ICS
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return JSON_LINES
+    raise ValueError("Unrecognised calendar format for '{0}'".format(path))
+
+
+def unfold_lines(lines):
+    # iCalendar folds long lines by starting continuation lines with a space or tab
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def ics_blocks(lines):
+    # Yields the unfolded content lines of each VEVENT, one event in memory at a time
+    block = None
+    for line in unfold_lines(lines):
+        upper = line.upper()
+        if upper == 'BEGIN:VEVENT':
+            block = []
+        elif upper == 'END:VEVENT':
+            if block is not None:
+                yield block
+            block = None
+        elif block is not None:
+            block.append(line)
+
+
+def split_ics_property(line):
+    name_and_params, _, value = line.partition(':')
+    parts = name_and_params.split(';')
+    params = dict(part.split('=', 1) for part in parts[1:] if '=' in part)
+    return parts[0].upper(), params, value
+
+
+def unescape_ics_text(value):
+    return re.sub(r'\\([\;,nN])', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+def parse_ics_datetime(value, params=None):
+    # TZID parameters are not resolved, such times are read as local wall-clock times
+    # Sliced by hand, strptime dominates the cost of a large import otherwise
+    value = value.strip()
+    try:
+        if (params or {}).get('VALUE', '').upper() == 'DATE' or len(value) == 8:
+            return datetime.datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+        if len(value) not in (15, 16) or value[8] != 'T':
+            raise ValueError
+        parsed = datetime.datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                                   int(value[9:11]), int(value[11:13]), int(value[13:15]))
+    except ValueError:
+        raise ValueError("Invalid date-time '{0}'".format(value))
+    if value.endswith('Z'):
+        return utc_to_local(parsed)
+    return parsed
+
+
+def parse_ics_exdate(value, params, start):
+    exdate = parse_ics_datetime(value, params)
+    if (params or {}).get('VALUE', '').upper() == 'DATE' or len(value.strip()) == 8:
+        # A date excludes that day's occurrence of a timed series
+        return datetime.datetime.combine(exdate.date(), start.time())
+    return exdate
+
+
+def parse_ics_duration(value):
+    match = ICS_DURATION.match(value.strip())
+    if match is None:
+        raise ValueError("Invalid duration '{0}'".format(value))
+    duration = datetime.timedelta(**dict((name, int(amount or 0)) for name, amount in match.groupdict().items()
+                                         if name != 'sign'))
+    return -duration if match.group('sign') == '-' else duration
+
+
+def ics_block_identity(block):
+    # (uid, recurrence id) of an event. Modified instances of a recurring
+    # event share its UID and name the occurrence they replace in RECURRENCE-ID.
+    uid = None
+    recurrence_id = None
+    for line in block:
+        prefix = line[:3].upper()
+        if prefix == 'UID' or prefix == 'REC':
+            name, params, value = split_ics_property(line)
+            if name == 'UID':
+                uid = value
+            elif name == 'RECURRENCE-ID':
+                recurrence_id = params, value
+    return uid, recurrence_id
+
+
+def ics_block_uid(block):
+    uid, recurrence_id = ics_block_identity(block)
+    if uid is not None and recurrence_id is not None:
+        return "{0};{1}".format(uid, recurrence_id[1])
+    return uid
+
+
+def event_from_ics_block(block, source=None, uid=None):
+    properties = {}
+    exdates = []
+    for line in block:
+        name, params, value = split_ics_property(line)
+        properties.setdefault(name, (params, value))
+        if name == 'EXDATE':
+            exdates.extend((params, exdate) for exdate in value.split(','))
+
+    if properties.get('STATUS', ({}, ''))[1].upper() == 'CANCELLED' or 'DTSTART' not in properties:
+        return None
+
+    start = parse_ics_datetime(properties['DTSTART'][1], properties['DTSTART'][0])
+    if 'DTEND' in properties:
+        end = parse_ics_datetime(properties['DTEND'][1], properties['DTEND'][0])
+    elif 'DURATION' in properties:
+        end = start + parse_ics_duration(properties['DURATION'][1])
+    elif properties['DTSTART'][0].get('VALUE', '').upper() == 'DATE':
+        end = start + datetime.timedelta(days=1)
+    else:
+        end = start
+
+    recurrence = Recurrence.from_rrule(properties['RRULE'][1]) if 'RRULE' in properties else None
+    if recurrence is not None and exdates:
+        recurrence = recurrence.with_exdates(parse_ics_exdate(value, params, start) for params, value in exdates)
+    title = unescape_ics_text(properties.get('SUMMARY', ({}, ''))[1])
+
+    return Event(start, max(start, end), title, source=source, recurrence=recurrence, uid=uid or ics_block_uid(block))
+
+
+def parse_json_datetime(value):
+    for datetime_format in JSON_DATETIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, datetime_format)
+        except ValueError:
+            pass
+    raise ValueError("Invalid datetime '{0}'".format(value))
+
+
+def event_from_json(data, source=None):
+    start = parse_json_datetime(data['start'])
+    end = parse_json_datetime(data['end']) if data.get('end') else start
+    recurrence = Recurrence.from_rrule(data['rrule']) if data.get('rrule') else None
+    uid = data.get('uid')
+    return Event(start, end, data.get('title', ''), source=source, recurrence=recurrence,
+                 uid=None if uid is None else str(uid))
+
+
+def ics_entries(lines):
+    # (uid, fingerprint, parse, override) per event, where parse builds the
+    # Event on demand and override is the (master uid, original start) of an
+    # occurrence this entry replaces
+    for block in ics_blocks(lines):
+        uid, recurrence_id = ics_block_identity(block)
+        override = None
+        if uid is not None and recurrence_id is not None:
+            try:
+                override = uid, parse_ics_datetime(recurrence_id[1], recurrence_id[0])
+            except ValueError:
+                pass
+            uid = "{0};{1}".format(uid, recurrence_id[1])
+        yield (uid, hash(tuple(block)), lambda source, block=block, uid=uid: event_from_ics_block(block, source, uid),
+               override)
+
+
+def json_line_entries(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            data = e
+        if not isinstance(data, dict):
+            # Left for parse to reject, so the importer counts it as invalid
+            yield None, hash(line), lambda source, line=line: _reject_json_line(line), None
+            continue
+        uid = data.get('uid')
+        yield ((None if uid is None else str(uid)), hash(line), lambda source, data=data: event_from_json(data, source),
+               None)
+
+
+def _reject_json_line(line):
+    raise ValueError("Calendar line is not a JSON object: {0}".format(line[:80]))
+
+
+# Streams one calendar source into an EventStore. Entries are read a line at
+# a time and only the changes are kept until the end of the source. The
+# importer remembers a fingerprint of each entry's raw text, so a re-sync
+# only parses and stores the entries that changed and removes the ones that
+# disappeared from the source.
+#
+# Modified instances of a recurring event are stored as events of their own,
+# and once the whole source has been read, the occurrences they replace are
+# excluded from their master's series. The importer remembers each master's
+# own EXDATEs so that exclusion can be redone without re-parsing it.
+class CalendarImporter:
+
+    def __init__(self, store, source):
+        self._store = store
+        self._source = source
+        self._fingerprints = {}
+        self._exdates = {}
+        self._overrides = {}
+        self._file_stamp = None
+
+    def get_source(self):
+        return self._source
+
+    def sync_file(self, path, calendar_format=None):
+        stat = os.stat(path)
+        file_stamp = (path, stat.st_size, stat.st_mtime)
+        if file_stamp == self._file_stamp:
+            return {"added": 0, "updated": 0, "removed": 0, "unchanged": len(self._fingerprints), "invalid": 0,
+                    "skipped": True}
+
+        with open(path, encoding='utf-8', errors='replace', newline='') as calendar_file:
+            result = self.sync_lines(calendar_file, calendar_format or format_for_path(path))
+        self._file_stamp = file_stamp
+        return result
+
+    def sync_lines(self, lines, calendar_format):
+        # The whole source is read before the store is touched, then every
+        # addition, removal and exclusion goes in as one update. The agenda
+        # never sees a half-read calendar, and a read that fails partway
+        # leaves both the store and the importer as they were.
+        entries = ics_entries(lines) if calendar_format == ICS else json_line_entries(lines)
+
+        result = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "invalid": 0, "skipped": False}
+        fingerprints = {}
+        exdates = {}
+        overrides = {}
+        added = {}
+        removed = []
+
+        for uid, fingerprint, parse, override in entries:
+            if uid is None:
+                # Without a UID the entry's content is its identity
+                uid = "#{0:x}".format(fingerprint & 0xffffffffffffffff)
+
+            if uid in fingerprints:
+                # The first entry for a UID wins, later duplicates are dropped
+                continue
+            if self._fingerprints.get(uid) == fingerprint:
+                fingerprints[uid] = fingerprint
+                if override is not None:
+                    overrides.setdefault(override[0], set()).add(override[1])
+                result["unchanged"] += 1
+                if uid in self._exdates:
+                    exdates[uid] = self._exdates[uid]
+                continue
+
+            existing = self._store.get_by_key(self._source, uid)
+            try:
+                event = parse(self._source)
+            except (AssertionError, KeyError, ValueError):
+                # One malformed entry should not abort a whole calendar. It
+                # is not fingerprinted, so it is parsed and counted as
+                # invalid again on every sync, and an earlier valid copy is
+                # removed with the stale entries rather than left showing
+                # what the source no longer says.
+                result["invalid"] += 1
+                continue
+
+            fingerprints[uid] = fingerprint
+            if override is not None:
+                overrides.setdefault(override[0], set()).add(override[1])
+            if event is None:
+                if existing is not None:
+                    removed.append(existing)
+                continue
+
+            event.uid = uid
+            if event.is_recurring() and event.recurrence.exdates:
+                exdates[uid] = event.recurrence.exdates
+            result["updated" if existing is not None else "added"] += 1
+            added[uid] = event
+
+        stale = [self._store.get_by_key(self._source, uid) for uid in self._fingerprints if uid not in fingerprints]
+        removed.extend(event for event in stale if event is not None)
+        self._exclude_overridden(added, fingerprints, exdates, overrides)
+
+        self._store.update(added=added.values(), removed=removed)
+        result["removed"] = len(removed)
+
+        self._fingerprints = fingerprints
+        self._exdates = exdates
+        self._overrides = overrides
+        return result
+
+    def _exclude_overridden(self, added, fingerprints, exdates, overrides):
+        # Masters whose overrides were added or dropped get their exclusions
+        # redone, a freshly parsed master in place and a stored one by a copy
+        for uid in set(overrides) | set(self._overrides):
+            if uid not in fingerprints:
+                continue
+            master = added.get(uid) or self._store.get_by_key(self._source, uid)
+            if master is None or not master.is_recurring():
+                continue
+            excluded = exdates.get(uid, frozenset()) | overrides.get(uid, frozenset())
+            if excluded == master.recurrence.exdates:
+                continue
+            if uid in added:
+                master.recurrence = master.recurrence.with_exdates(excluded)
+            else:
+                added[uid] = Event(master.start, master.end, master.title, source=master.source,
+                                   recurrence=master.recurrence.with_exdates(excluded), uid=uid)
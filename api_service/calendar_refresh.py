@@ -0,0 +1,198 @@
+import datetime
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from api_service.calendar_import import CalendarImporter, ICS, format_for_path
+
+DEFAULT_REFRESH_SECONDS = 15 * 60
+MAX_BACKOFF_SECONDS = 60 * 60
+HTTP_TIMEOUT_SECONDS = 30
+
+# How long the worker waits after a refresh pass fails outright
+RETRY_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+
+class CalendarSource:
+
+    def __init__(self, name, location, interval=DEFAULT_REFRESH_SECONDS, calendar_format=None,
+                 timeout=HTTP_TIMEOUT_SECONDS):
+        self.name = name
+        self.location = location
+        self.interval = interval
+        self.calendar_format = calendar_format
+        self.timeout = timeout
+        self.next_run = 0
+        self.failures = 0
+        self.last_refresh = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+        self._etag = None
+        self._last_modified = None
+
+    def is_remote(self):
+        return urllib.parse.urlparse(self.location).scheme in ('http', 'https')
+
+    def sync(self, importer):
+        if not self.is_remote():
+            return importer.sync_file(self.location, self.calendar_format)
+
+        request = urllib.request.Request(self.location)
+        if self._etag:
+            request.add_header('If-None-Match', self._etag)
+        if self._last_modified:
+            request.add_header('If-Modified-Since', self._last_modified)
+
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "invalid": 0, "skipped": True}
+            raise
+
+        with response:
+            calendar_format = self.calendar_format or self._format_for_response(response)
+            lines = io.TextIOWrapper(response, encoding='utf-8', errors='replace', newline='')
+            result = importer.sync_lines(lines, calendar_format)
+            self._etag = response.headers.get('ETag')
+            self._last_modified = response.headers.get('Last-Modified')
+        return result
+
+    def _format_for_response(self, response):
+        if 'calendar' in response.headers.get('Content-Type', ''):
+            return ICS
+        return format_for_path(urllib.parse.urlparse(self.location).path)
+
+    def dump_status(self):
+        return {
+            "name": self.name,
+            "location": self.location,
+            "interval_seconds": self.interval,
+            "last_refresh": self.last_refresh.isoformat() if self.last_refresh else None,
+            "last_duration_seconds": self.last_duration,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "consecutive_failures": self.failures,
+        }
+
+
+def load_calendar_sources(path):
+    with open(path) as sources_file:
+        sources = json.load(sources_file)
+
+    base = os.path.dirname(os.path.abspath(path))
+    return [
+        CalendarSource(
+            source['name'],
+            source['location'] if '://' in source['location'] else os.path.join(base, source['location']),
+            interval=source.get('interval', DEFAULT_REFRESH_SECONDS),
+            calendar_format=source.get('format'),
+        )
+        for source in sources
+    ]
+
+
+# Owns every calendar source. Fetching and parsing happen on this worker's
+# thread only, so request handlers never do the work themselves and a slow
+# feed can't hold up anything else. Sources are imported into the event
+# store, and refresh listeners run once a pass has finished, which is how
+# the agenda gets republished without waiting for its next tick.
+class CalendarRefresher:
+
+    def __init__(self, store, clock=time.monotonic):
+        self._store = store
+        self._clock = clock
+        self._sources = []
+        self._importers = {}
+        self._refresh_listeners = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add_source(self, source):
+        with self._lock:
+            self._sources.append(source)
+            self._importers[source.name] = CalendarImporter(self._store, source.name)
+        self._wake.set()
+
+    def add_refresh_listener(self, listener):
+        # listener() runs on the worker thread after a pass refreshed any source
+        self._refresh_listeners.append(listener)
+
+    def get_sources(self):
+        with self._lock:
+            return list(self._sources)
+
+    def dump_status(self):
+        return [source.dump_status() for source in self.get_sources()]
+
+    def refresh_source(self, source):
+        started = self._clock()
+        try:
+            source.last_result = source.sync(self._importers[source.name])
+            source.last_error = None
+            source.failures = 0
+            source.next_run = started + source.interval
+        except Exception as e:
+            # Back off exponentially, a dead feed should not be hammered
+            source.last_error = "{0}: {1}".format(type(e).__name__, e)
+            source.failures += 1
+            source.next_run = started + min(source.interval * 2 ** source.failures, MAX_BACKOFF_SECONDS)
+        source.last_duration = round(self._clock() - started, 3)
+        source.last_refresh = datetime.datetime.now()
+
+    def run_pending(self):
+        # Refreshes every due source and returns how long the worker can
+        # sleep before the next one is due, or None when there are none
+        refreshed = False
+        for source in self.get_sources():
+            if source.next_run <= self._clock():
+                self.refresh_source(source)
+                refreshed = True
+
+        if refreshed:
+            for listener in self._refresh_listeners:
+                listener()
+
+        next_runs = [source.next_run - self._clock() for source in self.get_sources()]
+        return max(0, min(next_runs)) if next_runs else None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                delay = self.run_pending()
+            except Exception:
+                # Sources already back off on their own, this keeps a failing
+                # listener from killing the thread for good
+                logger.exception("Calendar refresh pass failed")
+                delay = RETRY_SECONDS
+            self._wake.wait(delay)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="calendar-refresh")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
@@ -0,0 +1,124 @@
+import datetime
+import json
+import logging
+import threading
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+MONTH_NAMES = [
+    "January", "February", "March",
+    "April", "May", "June",
+    "July", "August", "September",
+    "October", "November", "December"
+]
+
+RECONNECT_MILLISECONDS = 5000
+
+# Sent with the 503 for a stream refused at the subscriber cap, the page's
+# script waits as long before it tries again
+STREAM_RETRY_AFTER_SECONDS = 10
+
+# Idle connections get a comment line this often so dead clients are noticed
+HEARTBEAT_SECONDS = 30
+
+CLOCK_TOPIC = "clock"
+AGENDA_TOPIC = "agenda"
+
+logger = logging.getLogger(__name__)
+
+
+def ordinal_suffix_of(i):
+    if i % 10 == 1 and i % 100 != 11:
+        return "st"
+    if i % 10 == 2 and i % 100 != 12:
+        return "nd"
+    if i % 10 == 3 and i % 100 != 13:
+        return "rd"
+    return "th"
+
+
+def format_clock(now):
+    return {
+        "day": DAY_NAMES[now.weekday()],
+        "date": "{0}{1} {2}".format(now.day, ordinal_suffix_of(now.day), MONTH_NAMES[now.month - 1]),
+        "time": now.strftime("%H:%M")
+    }
+
+
+def sse_event(name, data):
+    return "event: {0}\ndata: {1}\n\n".format(name, json.dumps(data, separators=(',', ':')))
+
+
+def publish_state(broadcaster, agenda, now):
+    # Called once per tick for the whole process, the broadcaster drops
+    # frames identical to the last one so subscribers only wake on changes
+    clock = format_clock(now)
+    broadcaster.publish(CLOCK_TOPIC, clock, sse_event(CLOCK_TOPIC, clock).encode('utf-8'))
+
+    version, items = agenda.get_snapshot()
+    agenda_frame = {"version": version, "events": items}
+    broadcaster.publish(AGENDA_TOPIC, version, sse_event(AGENDA_TOPIC, agenda_frame).encode('utf-8'))
+
+
+# Rolls the agenda forward and publishes the clock and agenda frames at
+# every minute boundary, on a thread of its own so a long calendar import
+# never makes the displayed time late. wake() publishes straight away,
+# e.g. once a calendar refresh has changed the event store.
+class ClockTicker:
+
+    def __init__(self, agenda, broadcaster, clock=datetime.datetime.now):
+        self._agenda = agenda
+        self._broadcaster = broadcaster
+        self._clock = clock
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def tick(self, now=None):
+        # Publishes the state for `now` and returns the seconds until the next minute
+        now = now or self._clock()
+        self._agenda.refresh(now)
+        publish_state(self._broadcaster, self._agenda, now)
+        return 60 - now.second - now.microsecond / 1000000.0
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                delay = self.tick()
+            except Exception:
+                logger.exception("Clock tick failed")
+                delay = 60
+            self._wake.wait(delay)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="clock-tick")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+def clock_stream(subscription, heartbeat=HEARTBEAT_SECONDS):
+    try:
+        yield "retry: {0}\n\n".format(RECONNECT_MILLISECONDS).encode('utf-8')
+
+        while True:
+            frames = subscription.next_frames(timeout=heartbeat)
+            yield b''.join(frames) if frames else b": keepalive\n\n"
+    finally:
+        subscription.close()
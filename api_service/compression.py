@@ -0,0 +1,38 @@
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Below this size compression costs more than it saves
+MIN_COMPRESS_BYTES = 256
+
+
+def compress_variants(body):
+    # Every encoding of a body is produced once, up front, so serving a
+    # compressed response never compresses on the request path
+    variants = {None: body}
+    if len(body) < MIN_COMPRESS_BYTES:
+        return variants
+    variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+    if brotli is not None:
+        variants['br'] = brotli.compress(body)
+    return variants
+
+
+def negotiate_encoding(accept_encodings, variants):
+    encodings = [encoding for encoding in ('br', 'gzip') if encoding in variants]
+    return accept_encodings.best_match(encodings) if encodings else None
+
+
+def send_variant(response, variants, encoding, etag):
+    # Each encoding is its own representation, so it gets its own strong ETag
+    body = variants[encoding]
+    response.set_data(body)
+    response.headers['Vary'] = "Accept-Encoding"
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+        etag = "{0}-{1}".format(etag, encoding)
+    response.set_etag(etag)
+    return response
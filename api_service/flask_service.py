@@ -1,7 +1,108 @@
-from flask import request, render_template
+from flask import Blueprint, request, render_template, abort, url_for, Response
 
-from api_service import application
+import api_service
+from api_service import STATIC_MAX_AGE_SECONDS
+from api_service.clock_stream import clock_stream, STREAM_RETRY_AFTER_SECONDS
+from api_service.compression import negotiate_encoding, send_variant
+from api_service.metrics import METRICS_CONTENT_TYPE
+from api_service.page_cache import PageCache
+from api_service.responses.json_response import json_response
+from api_service.responses.too_many_streams_response import too_many_streams_response
 
-@application.route('/', methods=['GET'])
+blueprint = Blueprint('mirror', __name__)
+
+home_page = PageCache()
+
+@blueprint.app_url_defaults
+def add_static_version(endpoint, values):
+    # A bundled asset's URL carries its fingerprint, so a changed file is a
+    # different URL and the old one can be cached for good. Anything outside
+    # the bundle is left unversioned rather than read here.
+    if endpoint != 'static' or 'filename' not in values:
+        return
+
+    asset = api_service.get_asset_bundle().get(values['filename'])
+    if asset is not None:
+        values['v'] = asset.fingerprint
+
+
+@blueprint.after_app_request
+def cache_versioned_static(response):
+    # Only a static URL naming the file's current fingerprint gets the
+    # year-long max-age, unversioned files are revalidated on each use
+    if request.endpoint != 'static' or response.status_code >= 400 or 'v' not in request.args:
+        return response
+
+    asset = api_service.get_asset_bundle().get(request.view_args['filename'])
+    if asset is not None and asset.fingerprint == request.args['v']:
+        response.headers['Cache-Control'] = "public, max-age={0}, immutable".format(STATIC_MAX_AGE_SECONDS)
+    return response
+
+
+@blueprint.app_template_global()
+def asset_url(filename):
+    return url_for('mirror.call_asset', fingerprint=api_service.get_asset_bundle().get(filename).fingerprint,
+                   filename=filename)
+
+
+@blueprint.app_template_global()
+def stream_port():
+    # The evented stream server's port when one is running, else None and
+    # the page streams from this app's own /stream route
+    stream_server = api_service.get_stream_server()
+    return stream_server.get_port() if stream_server.is_running() else None
+
+
+@blueprint.app_template_global()
+def inline_asset(filename):
+    return api_service.get_asset_bundle().get_inline(filename)
+
+
+@blueprint.route('/', methods=['GET'])
 def call_home():
-    return render_template('home.html')
+    version, events = api_service.get_agenda().get_snapshot()
+
+    variants, etag = home_page.get(version, lambda: render_template('home.html', events=events))
+
+    encoding = negotiate_encoding(request.accept_encodings, variants)
+    response = send_variant(Response(mimetype='text/html'), variants, encoding, etag)
+    response.headers['Cache-Control'] = "no-cache"
+    return response.make_conditional(request)
+
+
+@blueprint.route('/assets/<fingerprint>/<path:filename>', methods=['GET'])
+def call_asset(fingerprint, filename):
+    asset = api_service.get_asset_bundle().get(filename)
+    if asset is None or asset.fingerprint != fingerprint:
+        abort(404)
+
+    encoding = negotiate_encoding(request.accept_encodings, asset.variants)
+    response = send_variant(Response(content_type=asset.mimetype), asset.variants, encoding, asset.fingerprint)
+    response.headers['Cache-Control'] = "public, max-age={0}, immutable".format(STATIC_MAX_AGE_SECONDS)
+    return response.make_conditional(request)
+
+
+@blueprint.route('/stream', methods=['GET'])
+def call_stream():
+    subscription = api_service.get_broadcaster().subscribe()
+    if subscription is None:
+        response = too_many_streams_response()
+        response.headers['Retry-After'] = str(STREAM_RETRY_AFTER_SECONDS)
+        return response
+
+    response = Response(clock_stream(subscription), mimetype='text/event-stream')
+    # Also releases the subscription if the client goes before the stream starts
+    response.call_on_close(subscription.close)
+    response.headers['Cache-Control'] = "no-cache"
+    response.headers['X-Accel-Buffering'] = "no"
+    return response
+
+
+@blueprint.route('/metrics', methods=['GET'])
+def call_metrics():
+    return Response(api_service.get_metrics().dump_text(), content_type=METRICS_CONTENT_TYPE)
+
+
+@blueprint.route('/sources', methods=['GET'])
+def call_sources():
+    return json_response(api_service.get_calendar_refresher().dump_status())
@@ -0,0 +1,306 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import g, request, before_render_template, template_rendered
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+UNMATCHED_ROUTE = "unmatched"
+
+# How long a worker may sit on new observations before publishing them to
+# the shared snapshot directory
+SNAPSHOT_INTERVAL_SECONDS = 1.0
+
+
+class _Histogram:
+
+    __slots__ = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+
+
+class _Shard:
+    # Owned by a single thread, so recording never takes a lock. Scrapes
+    # copy each shard's dicts, which is atomic under the GIL, and sum them.
+
+    __slots__ = ('thread', 'latencies', 'statuses', 'renders', 'in_flight', 'render_started')
+
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.latencies = {}
+        self.statuses = {}
+        self.renders = {}
+        self.in_flight = 0
+        self.render_started = None
+
+    def absorb(self, other):
+        # Folds a finished thread's shard into this one. Merged histograms
+        # are swapped in whole, so a concurrent scrape never sees half of one.
+        for attribute in ('latencies', 'renders'):
+            histograms = getattr(self, attribute)
+            for key, histogram in getattr(other, attribute).items():
+                merged = _Histogram()
+                existing = histograms.get(key, merged)
+                merged.counts = [a + b for a, b in zip(existing.counts, histogram.counts)]
+                merged.total = existing.total + histogram.total
+                histograms[key] = merged
+        for key, count in other.statuses.items():
+            self.statuses[key] = self.statuses.get(key, 0) + count
+
+
+def _observe(histograms, key, seconds):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = _Histogram()
+    histogram.observe(seconds)
+
+
+def _snapshot(shards):
+    # Plain, JSON-friendly totals across shards
+    latencies, renders, statuses = {}, {}, {}
+    for shard in shards:
+        _merge_histograms(latencies, dict(shard.latencies))
+        _merge_histograms(renders, dict(shard.renders))
+        _merge_counts(statuses, dict(shard.statuses))
+    return {
+        "latencies": latencies,
+        "renders": renders,
+        "statuses": statuses,
+        "in_flight": sum(shard.in_flight for shard in shards),
+    }
+
+
+def _merge_histograms(merged, histograms):
+    for key, histogram in histograms.items():
+        counts, total = (histogram.counts, histogram.total) if isinstance(histogram, _Histogram) else histogram
+        if key in merged:
+            merged_counts, merged_total = merged[key]
+            merged[key] = ([a + b for a, b in zip(merged_counts, counts)], merged_total + total)
+        else:
+            merged[key] = (list(counts), total)
+
+
+def _merge_counts(merged, counts):
+    for key, count in counts.items():
+        merged[key] = merged.get(key, 0) + count
+
+
+def _merge_snapshots(snapshots):
+    merged = {"latencies": {}, "renders": {}, "statuses": {}, "in_flight": 0}
+    for snapshot in snapshots:
+        _merge_histograms(merged["latencies"], snapshot["latencies"])
+        _merge_histograms(merged["renders"], snapshot["renders"])
+        _merge_counts(merged["statuses"], snapshot["statuses"])
+        merged["in_flight"] += snapshot["in_flight"]
+    return merged
+
+
+def _dump_snapshot(snapshot):
+    return json.dumps({
+        "pid": os.getpid(),
+        "latencies": [[key, counts, total] for key, (counts, total) in snapshot["latencies"].items()],
+        "renders": [[key, counts, total] for key, (counts, total) in snapshot["renders"].items()],
+        "statuses": [[route, status, count] for (route, status), count in snapshot["statuses"].items()],
+        "in_flight": snapshot["in_flight"],
+    })
+
+
+def _load_snapshot(text):
+    data = json.loads(text)
+    return data["pid"], {
+        "latencies": dict((key, (counts, total)) for key, counts, total in data["latencies"]),
+        "renders": dict((key, (counts, total)) for key, counts, total in data["renders"]),
+        "statuses": dict(((route, status), count) for route, status, count in data["statuses"]),
+        "in_flight": data["in_flight"],
+    }
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def clear_snapshots(directory):
+    # Run once before the workers start, so a previous run's counts don't leak in
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        os.remove(path)
+
+
+def _format_labels(labels):
+    return ','.join('{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in labels)
+
+
+def _format_histogram(name, help_text, label_name, histograms):
+    lines = ["# HELP {0} {1}".format(name, help_text), "# TYPE {0} histogram".format(name)]
+    for key in sorted(histograms):
+        counts, total = histograms[key]
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+            cumulative += count
+            lines.append("{0}_bucket{{{1}}} {2}".format(name, _format_labels([(label_name, key), ('le', bound)]), cumulative))
+        lines.append("{0}_sum{{{1}}} {2}".format(name, _format_labels([(label_name, key)]), total))
+        lines.append("{0}_count{{{1}}} {2}".format(name, _format_labels([(label_name, key)]), cumulative))
+    return lines
+
+
+# Each thread records into its own shard. Shards of threads that have
+# exited are folded into a single retired shard, so a server that spawns a
+# thread per request doesn't accumulate them.
+#
+# Every pre-forked worker process has its own Metrics. Given a directory,
+# each worker publishes its totals there as <pid>.json shortly after
+# handling requests, and a scrape served by any worker sums all the files.
+# Files of exited workers keep counting towards the totals, so counters
+# never go backwards when gunicorn replaces a worker; only their in-flight
+# gauge is dropped.
+class Metrics:
+
+    def __init__(self, directory=None):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard()
+        self._shards_lock = threading.Lock()
+        self._directory = directory
+        self._publish_lock = threading.Lock()
+        self._publish_timer = None
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            # Only a thread's first observation registers its shard
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._shards_lock:
+                self._retire_dead_shards()
+                self._shards.append(shard)
+        return shard
+
+    def _retire_dead_shards(self):
+        live = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                live.append(shard)
+            else:
+                self._retired.absorb(shard)
+        self._shards = live
+
+    def init_app(self, application):
+        application.before_request(self._before_request)
+        application.after_request(self._after_request)
+        application.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, application, weak=False)
+        template_rendered.connect(self._after_render, application, weak=False)
+
+    def _before_request(self):
+        self._shard().in_flight += 1
+        g.metrics_started = time.perf_counter()
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is not None:
+            self.observe_request(request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE,
+                                 response.status_code, time.perf_counter() - started)
+        return response
+
+    def _teardown_request(self, exception):
+        if g.pop('metrics_started', None) is not None:
+            self._shard().in_flight -= 1
+            if self._directory is not None:
+                self._schedule_publish()
+
+    def _before_render(self, sender, template, context, **extra):
+        self._shard().render_started = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        shard = self._shard()
+        if shard.render_started is not None:
+            _observe(shard.renders, template.name, time.perf_counter() - shard.render_started)
+            shard.render_started = None
+
+    def observe_request(self, route, status, seconds):
+        shard = self._shard()
+        _observe(shard.latencies, route, seconds)
+        key = (route, status)
+        shard.statuses[key] = shard.statuses.get(key, 0) + 1
+
+    def get_shards(self):
+        with self._shards_lock:
+            self._retire_dead_shards()
+            return [self._retired] + self._shards
+
+    def _schedule_publish(self):
+        # Batches a busy worker's writes to one per interval
+        with self._publish_lock:
+            if self._publish_timer is not None:
+                return
+            self._publish_timer = threading.Timer(SNAPSHOT_INTERVAL_SECONDS, self._publish_scheduled)
+            self._publish_timer.daemon = True
+            self._publish_timer.start()
+
+    def _publish_scheduled(self):
+        with self._publish_lock:
+            self._publish_timer = None
+        self.publish_snapshot()
+
+    def publish_snapshot(self):
+        path = os.path.join(self._directory, '{0}.json'.format(os.getpid()))
+        partial = '{0}.{1}.tmp'.format(path, threading.get_ident())
+        with open(partial, 'w') as snapshot_file:
+            snapshot_file.write(_dump_snapshot(_snapshot(self.get_shards())))
+        os.replace(partial, path)
+
+    def _collect(self):
+        if self._directory is None:
+            return _snapshot(self.get_shards())
+
+        self.publish_snapshot()
+        snapshots = []
+        for path in glob.glob(os.path.join(self._directory, '*.json')):
+            try:
+                with open(path) as snapshot_file:
+                    pid, snapshot = _load_snapshot(snapshot_file.read())
+            except (OSError, ValueError):
+                continue
+            if not _is_running(pid):
+                snapshot["in_flight"] = 0
+            snapshots.append(snapshot)
+        return _merge_snapshots(snapshots)
+
+    def dump_text(self):
+        snapshot = self._collect()
+
+        lines = _format_histogram("mirror_http_request_duration_seconds", "Request latency by route.", 'route',
+                                  snapshot["latencies"])
+
+        statuses = snapshot["statuses"]
+        lines.append("# HELP mirror_http_requests_total Requests by route and status.")
+        lines.append("# TYPE mirror_http_requests_total counter")
+        for route, status in sorted(statuses):
+            lines.append("mirror_http_requests_total{{{0}}} {1}".format(
+                _format_labels([('route', route), ('status', status)]), statuses[(route, status)]))
+
+        lines.append("# HELP mirror_http_requests_in_flight Requests currently being handled.")
+        lines.append("# TYPE mirror_http_requests_in_flight gauge")
+        lines.append("mirror_http_requests_in_flight {0}".format(snapshot["in_flight"]))
+
+        lines.extend(_format_histogram("mirror_template_render_seconds", "Template render time.", 'template',
+                                       snapshot["renders"]))
+
+        return '\n'.join(lines) + '\n'
@@ -1,4 +1,48 @@
+from api_service.objects.recurrence import get_occurrence_starts
+
+
 class Event:
 
-    def __init__(self):
-        pass
\ No newline at end of file
+    __slots__ = ('start', 'end', 'title', 'source', 'recurrence', 'uid')
+
+    def __init__(self, start, end, title, source=None, recurrence=None, uid=None):
+        assert start <= end, "Event '{0}' ends before it starts".format(title)
+        self.start = start
+        self.end = end
+        self.title = title
+        self.source = source
+        self.recurrence = recurrence
+        self.uid = uid
+
+    def get_key(self):
+        return None if self.uid is None else (self.source, self.uid)
+
+    def get_duration(self):
+        return self.end - self.start
+
+    def overlaps(self, start, end):
+        return self.start < end and self.end > start
+
+    def is_recurring(self):
+        return self.recurrence is not None
+
+    def get_occurrences(self, start, end):
+        if not self.is_recurring():
+            return [self] if self.overlaps(start, end) else []
+
+        duration = self.get_duration()
+        return [
+            Event(occurrence, occurrence + duration, self.title, self.source)
+            for occurrence in get_occurrence_starts(self.recurrence, self.start, duration, start, end)
+        ]
+
+    def __eq__(self, other):
+        if not isinstance(other, Event):
+            return NotImplemented
+        return (self.start, self.end, self.title, self.source, self.recurrence, self.uid) == \
+               (other.start, other.end, other.title, other.source, other.recurrence, other.uid)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Event({0!r}, {1!r}, {2!r})".format(self.start, self.end, self.title)
@@ -0,0 +1,215 @@
+import bisect
+import collections
+import datetime
+import operator
+import threading
+
+from api_service.objects.recurrence import get_last_occurrence_start
+
+# Above this many removals in one update, rebuilding the index in a single
+# pass beats deleting from the sorted lists one event at a time
+BISECT_REMOVAL_LIMIT = 32
+
+# One-off events longer than this are kept out of the sorted index, so a
+# single multi-week event can't widen every query's look-back window
+LONG_EVENT_DURATION = datetime.timedelta(days=1)
+
+
+def _rule_end(event):
+    last_start = get_last_occurrence_start(event.recurrence, event.start)
+    return None if last_start is None else last_start + event.get_duration()
+
+
+# One-off events are kept sorted by start time. The store also tracks the
+# longest of their durations, capped at LONG_EVENT_DURATION, so an overlap
+# query only has to look back that far from the window start; the rare
+# longer events sit in their own list and are checked one by one.
+#
+# Recurring events are held once per rule and expanded lazily for the
+# queried window. Rules that finish are kept sorted by the end of their last
+# occurrence, so a query skips every series that ended before the window;
+# only open-ended rules are always expanded.
+#
+# Events with a uid are unique per (source, uid): storing another with the
+# same key replaces the earlier one.
+class EventStore:
+
+    def __init__(self, events=()):
+        self._lock = threading.RLock()
+        self._starts = []
+        self._events = []
+        self._long = []
+        self._rule_ends = []
+        self._rules = []
+        self._open_rules = []
+        self._by_key = {}
+        self._max_duration = datetime.timedelta(0)
+        self._version = 0
+        self.add_all(events)
+
+    def get_version(self):
+        return self._version
+
+    def get_size(self):
+        return len(self._events) + len(self._long) + len(self._rules) + len(self._open_rules)
+
+    def get_by_key(self, source, uid):
+        return self._by_key.get((source, uid))
+
+    def add(self, event):
+        self.update(added=[event])
+
+    def add_all(self, events):
+        self.update(added=events)
+
+    def remove(self, event):
+        return self.update(removed=[event]) > 0
+
+    def update(self, added=(), removed=()):
+        # Applies a batch of additions and removals as one version bump and
+        # returns how many stored events were removed or replaced
+        unkeyed = []
+        keyed = collections.OrderedDict()
+        for event in added:
+            key = event.get_key()
+            if key is None:
+                unkeyed.append(event)
+            else:
+                keyed[key] = event
+        added = unkeyed + list(keyed.values())
+        removed = list(removed)
+
+        with self._lock:
+            for event in removed:
+                key = event.get_key()
+                if key is not None and self._by_key.get(key) is event:
+                    del self._by_key[key]
+
+            for key, event in keyed.items():
+                existing = self._by_key.get(key)
+                if existing is not None:
+                    removed.append(existing)
+                self._by_key[key] = event
+
+            removed_count = self._discard(removed)
+            self._insert(added)
+
+            if added or removed_count:
+                self._version += 1
+            return removed_count
+
+    def _insert(self, events):
+        single = []
+        for event in events:
+            if event.is_recurring():
+                self._insert_rule(event)
+            elif event.get_duration() > LONG_EVENT_DURATION:
+                self._long.append(event)
+            else:
+                single.append(event)
+
+        if len(single) == 1:
+            event = single[0]
+            index = bisect.bisect_right(self._starts, event.start)
+            self._starts.insert(index, event.start)
+            self._events.insert(index, event)
+        elif single:
+            single.sort(key=operator.attrgetter('start'))
+            if not self._starts or single[0].start >= self._starts[-1]:
+                # Chronological imports append without touching the existing index
+                self._events.extend(single)
+                self._starts.extend(event.start for event in single)
+            else:
+                merged = self._events + single
+                merged.sort(key=operator.attrgetter('start'))
+                self._events = merged
+                self._starts = [event.start for event in merged]
+
+        if single:
+            self._max_duration = max(self._max_duration, max(event.get_duration() for event in single))
+
+    def _insert_rule(self, event):
+        end = _rule_end(event)
+        if end is None:
+            self._open_rules.append(event)
+        else:
+            index = bisect.bisect_right(self._rule_ends, end)
+            self._rule_ends.insert(index, end)
+            self._rules.insert(index, event)
+
+    def _discard(self, events):
+        size = self.get_size()
+
+        removed_ids = set(id(event) for event in events)
+        rules = [event for event in events if event.is_recurring()]
+        if rules:
+            self._open_rules = [event for event in self._open_rules if id(event) not in removed_ids]
+        if len(rules) > BISECT_REMOVAL_LIMIT:
+            kept = [(end, event) for end, event in zip(self._rule_ends, self._rules) if id(event) not in removed_ids]
+            self._rule_ends = [end for end, event in kept]
+            self._rules = [event for end, event in kept]
+        else:
+            for event in rules:
+                end = _rule_end(event)
+                if end is not None:
+                    self._discard_sorted(self._rule_ends, self._rules, end, event)
+
+        single = [event for event in events if not event.is_recurring()]
+        if any(event.get_duration() > LONG_EVENT_DURATION for event in single):
+            self._long = [event for event in self._long if id(event) not in removed_ids]
+        if len(single) > BISECT_REMOVAL_LIMIT:
+            self._events = [event for event in self._events if id(event) not in removed_ids]
+            self._starts = [event.start for event in self._events]
+        else:
+            for event in single:
+                self._discard_sorted(self._starts, self._events, event.start, event)
+
+        return size - self.get_size()
+
+    @staticmethod
+    def _discard_sorted(keys, events, key, event):
+        low = bisect.bisect_left(keys, key)
+        high = bisect.bisect_right(keys, key)
+        for index in range(low, high):
+            if events[index] is event:
+                del keys[index]
+                del events[index]
+                return
+
+    def clear(self):
+        with self._lock:
+            self._starts = []
+            self._events = []
+            self._long = []
+            self._rule_ends = []
+            self._rules = []
+            self._open_rules = []
+            self._by_key = {}
+            self._max_duration = datetime.timedelta(0)
+            self._version += 1
+
+    def get_events_between(self, start, end):
+        with self._lock:
+            low = bisect.bisect_right(self._starts, start - self._max_duration)
+            high = bisect.bisect_left(self._starts, end)
+            events = [event for event in self._events[low:high] if event.end > start]
+            long_events = [event for event in self._long if event.overlaps(start, end)]
+            low = bisect.bisect_right(self._rule_ends, start)
+            recurring = [event for event in self._rules[low:] if event.start < end]
+            recurring.extend(event for event in self._open_rules if event.start < end)
+
+        if not recurring and not long_events:
+            return events
+
+        events.extend(long_events)
+        for event in recurring:
+            events.extend(event.get_occurrences(start, end))
+        events.sort(key=operator.attrgetter('start'))
+        return events
+
+    def get_events_on(self, day):
+        start = datetime.datetime.combine(day, datetime.time())
+        return self.get_events_between(start, start + datetime.timedelta(days=1))
+
+    def get_upcoming(self, now, hours):
+        return self.get_events_between(now, now + datetime.timedelta(hours=hours))
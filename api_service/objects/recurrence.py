@@ -0,0 +1,201 @@
+import calendar
+import datetime
+
+DAILY = 'DAILY'
+WEEKLY = 'WEEKLY'
+MONTHLY = 'MONTHLY'
+YEARLY = 'YEARLY'
+
+FREQUENCIES = (DAILY, WEEKLY, MONTHLY, YEARLY)
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+# Days of expansion each rule keeps. The home view's window spans two or
+# three days, so this covers it with room for a few other queries, and
+# unlike one cache shared by every rule it cannot be thrashed by a
+# calendar with thousands of them.
+DAYS_CACHED_PER_RULE = 8
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def utc_to_local(value):
+    # Times are kept as naive local wall-clock times throughout
+    return value.replace(tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def parse_rrule_datetime(value):
+    if 'T' in value:
+        parsed = datetime.datetime.strptime(value.rstrip('Z'), "%Y%m%dT%H%M%S")
+        return utc_to_local(parsed) if value.endswith('Z') else parsed
+    # A date-only UNTIL is inclusive, so it bounds the series at the end of that day
+    day = datetime.datetime.strptime(value, "%Y%m%d")
+    return datetime.datetime.combine(day.date(), datetime.time.max)
+
+
+class Recurrence:
+
+    __slots__ = ('frequency', 'interval', 'count', 'until', 'weekdays', 'exdates', '_expanded')
+
+    # exdates are occurrence starts left out of the series, from EXDATE or
+    # replaced by a modified instance. They still count towards COUNT.
+    def __init__(self, frequency, interval=1, count=None, until=None, weekdays=None, exdates=None):
+        assert frequency in FREQUENCIES, "Unsupported recurrence frequency '{0}'".format(frequency)
+        assert interval >= 1, "Recurrence interval must be at least 1"
+        assert weekdays is None or frequency == WEEKLY, "Weekdays are only supported for weekly recurrence"
+        self.frequency = frequency
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.weekdays = tuple(sorted(set(weekdays))) if weekdays else None
+        self.exdates = frozenset(exdates or ())
+        # (dtstart, day) -> occurrence starts on that day, oldest entry first
+        self._expanded = {}
+
+    @classmethod
+    def from_rrule(cls, rule):
+        if rule.upper().startswith('RRULE:'):
+            rule = rule[len('RRULE:'):]
+
+        try:
+            parts = dict(part.split('=', 1) for part in rule.upper().split(';') if part)
+            parts.pop('WKST', None)
+            frequency = parts.pop('FREQ')
+            interval = int(parts.pop('INTERVAL', 1))
+            count = int(parts['COUNT']) if 'COUNT' in parts else None
+            until = parse_rrule_datetime(parts['UNTIL']) if 'UNTIL' in parts else None
+            weekdays = [WEEKDAYS.index(day) for day in parts['BYDAY'].split(',')] if 'BYDAY' in parts else None
+        except (KeyError, ValueError) as e:
+            raise ValueError("Invalid recurrence rule '{0}': {1}".format(rule, e))
+
+        parts.pop('COUNT', None)
+        parts.pop('UNTIL', None)
+        parts.pop('BYDAY', None)
+        if parts:
+            raise ValueError("Unsupported recurrence rule parts: {0}".format(', '.join(sorted(parts))))
+
+        return cls(frequency, interval=interval, count=count, until=until, weekdays=weekdays)
+
+    def with_exdates(self, exdates):
+        return Recurrence(self.frequency, interval=self.interval, count=self.count, until=self.until,
+                          weekdays=self.weekdays, exdates=exdates)
+
+    def _key(self):
+        return self.frequency, self.interval, self.count, self.until, self.weekdays, self.exdates
+
+    def __eq__(self, other):
+        if not isinstance(other, Recurrence):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return "Recurrence({0!r}, interval={1!r}, count={2!r}, until={3!r}, weekdays={4!r}, exdates={5!r})".format(
+            self.frequency, self.interval, self.count, self.until, self.weekdays, sorted(self.exdates))
+
+
+# Each candidate generator jumps arithmetically to the first occurrence near
+# `earliest` and yields (index, start) pairs from there, where index is the
+# occurrence's position in the series for COUNT. Nothing is materialised, so
+# memory stays constant however far ahead a rule runs.
+
+def _daily_candidates(recurrence, dtstart, earliest):
+    period = datetime.timedelta(days=recurrence.interval)
+    index = max(0, (earliest - dtstart) // period)
+    while True:
+        yield index, dtstart + index * period
+        index += 1
+
+
+def _weekly_candidates(recurrence, dtstart, earliest):
+    weekdays = recurrence.weekdays or (dtstart.weekday(),)
+    first_week = [day for day in weekdays if day >= dtstart.weekday()]
+    anchor = dtstart - datetime.timedelta(days=dtstart.weekday())
+    period = datetime.timedelta(weeks=recurrence.interval)
+
+    week = max(0, (earliest - anchor) // period)
+    index = 0 if week == 0 else len(first_week) + (week - 1) * len(weekdays)
+    while True:
+        for day in (first_week if week == 0 else weekdays):
+            yield index, anchor + week * period + datetime.timedelta(days=day)
+            index += 1
+        week += 1
+
+
+def _monthly_candidates(recurrence, dtstart, earliest, months_per_step):
+    step = 0
+    if dtstart.day <= 28 or recurrence.count is None:
+        # Every step is a real occurrence, so the index can be jumped too
+        months_between = (earliest.year - dtstart.year) * 12 + earliest.month - dtstart.month
+        step = max(0, months_between // months_per_step)
+
+    index = step
+    while True:
+        year, month = divmod(dtstart.month - 1 + step * months_per_step, 12)
+        year += dtstart.year
+        if dtstart.day <= calendar.monthrange(year, month + 1)[1]:
+            yield index, dtstart.replace(year=year, month=month + 1)
+            index += 1
+        step += 1
+
+
+def _candidates(recurrence, dtstart, earliest):
+    if recurrence.frequency == DAILY:
+        return _daily_candidates(recurrence, dtstart, earliest)
+    if recurrence.frequency == WEEKLY:
+        return _weekly_candidates(recurrence, dtstart, earliest)
+    if recurrence.frequency == MONTHLY:
+        return _monthly_candidates(recurrence, dtstart, earliest, recurrence.interval)
+    return _monthly_candidates(recurrence, dtstart, earliest, recurrence.interval * 12)
+
+
+def iter_occurrence_starts(recurrence, dtstart, window_start, window_end):
+    for index, start in _candidates(recurrence, dtstart, window_start):
+        if recurrence.count is not None and index >= recurrence.count:
+            return
+        if recurrence.until is not None and start > recurrence.until:
+            return
+        if start >= window_end:
+            return
+        if start >= window_start and start not in recurrence.exdates:
+            yield start
+
+
+def get_last_occurrence_start(recurrence, dtstart):
+    # An upper bound on the series' final start, or None if it never ends.
+    # COUNT-limited rules walk the series once; UNTIL is bound enough.
+    if recurrence.count is None:
+        return recurrence.until
+
+    for index, start in _candidates(recurrence, dtstart, dtstart):
+        if recurrence.until is not None and start > recurrence.until:
+            return recurrence.until
+        if index >= recurrence.count - 1:
+            return start
+
+
+def _occurrence_starts_on_day(recurrence, dtstart, day):
+    expanded = recurrence._expanded
+    starts = expanded.get((dtstart, day))
+    if starts is None:
+        day_start = datetime.datetime.combine(day, datetime.time(tzinfo=dtstart.tzinfo))
+        starts = tuple(iter_occurrence_starts(recurrence, dtstart, day_start, day_start + ONE_DAY))
+        if len(expanded) >= DAYS_CACHED_PER_RULE:
+            for key in list(expanded)[:len(expanded) - DAYS_CACHED_PER_RULE + 1]:
+                expanded.pop(key, None)
+        expanded[(dtstart, day)] = starts
+    return starts
+
+
+def get_occurrence_starts(recurrence, dtstart, duration, window_start, window_end):
+    # Expansion is memoised per calendar day rather than per window, so the
+    # home view's sliding "next N hours" window keeps hitting the cache as
+    # it moves forward minute by minute.
+    day = (window_start - duration).date()
+    while day <= window_end.date():
+        for start in _occurrence_starts_on_day(recurrence, dtstart, day):
+            if start < window_end and start + duration > window_start:
+                yield start
+        day += ONE_DAY
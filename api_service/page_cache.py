@@ -0,0 +1,22 @@
+import hashlib
+
+from api_service.compression import compress_variants
+
+
+class PageCache:
+
+    def __init__(self):
+        self._entry = None
+
+    def get(self, key, render):
+        # Only the latest page is kept, the agenda version only moves forward.
+        # Two requests racing on a new version both render, which is harmless.
+        entry = self._entry
+        if entry is None or entry[0] != key:
+            body = render().encode('utf-8')
+            entry = (key, compress_variants(body), hashlib.sha1(body).hexdigest())
+            self._entry = entry
+        return entry[1], entry[2]
+
+    def clear(self):
+        self._entry = None
@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+from api_service import get_broadcaster, precompile, start_background_workers
+from api_service.metrics import clear_snapshots
+
+# Threads per worker kept back from the fallback /stream route, so pages,
+# assets and metrics are still served while every other thread holds an
+# open display stream
+REQUEST_THREADS = 4
+
+# Where gunicorn.conf.py puts the StreamServer unless MIRROR_STREAM_PORT says
+# otherwise, one above gunicorn's own default port
+DEFAULT_STREAM_PORT = 8001
+
+
+def set_worker_environment(stream_port=DEFAULT_STREAM_PORT):
+    # Must run before the application is created and the workers fork, so
+    # that every worker publishes its metrics to the same directory and
+    # /metrics sums them, rather than each reporting its own counters
+    if not os.environ.get('MIRROR_METRICS_DIR'):
+        os.environ['MIRROR_METRICS_DIR'] = tempfile.mkdtemp(prefix='mirror-metrics-')
+    os.environ.setdefault('MIRROR_STREAM_PORT', str(stream_port))
+
+
+def clear_metrics_snapshots(server):
+    directory = os.environ.get('MIRROR_METRICS_DIR')
+    if directory:
+        clear_snapshots(directory)
+
+
+def start_worker(worker):
+    # Runs in each worker after the fork, so the background threads are never
+    # started in a --preload master where they would not survive forking.
+    #
+    # Every worker keeps its own event store, so every worker also runs its
+    # own calendar refresher: each source is fetched and imported once per
+    # worker, N times the work of a single process. Conditional GETs and the
+    # unchanged-file check keep repeat refreshes cheap, but the memory and
+    # first import are paid per worker, so keep --workers near the core count.
+    precompile(worker.wsgi)
+    if get_broadcaster().get_max_subscribers() is None:
+        get_broadcaster().set_max_subscribers(max(1, worker.cfg.threads - REQUEST_THREADS))
+    start_background_workers()
+
+
+# Displays stream from each worker's StreamServer on MIRROR_STREAM_PORT,
+# which holds them all on one event loop at a socket each, so the thread
+# pool is left to pages, assets and metrics. Without a stream port the page
+# falls back to the app's own /stream, where an open display occupies a
+# thread for as long as it is connected: a server then takes only
+# workers * (threads - REQUEST_THREADS) displays and refuses further
+# streams with a 503 that the page retries. Sending the master SIGHUP
+# reloads workers gracefully, finishing in-flight requests.
+DEFAULT_OPTIONS = {
+    'worker_class': 'gthread',
+    'workers': 3,
+    'threads': 64,
+    'keepalive': 5,
+    'graceful_timeout': 30,
+    'on_starting': clear_metrics_snapshots,
+    'post_worker_init': start_worker,
+}
+
+
+class ProductionServer(BaseApplication):
+
+    def __init__(self, application, options=None):
+        self.application = application
+        self.options = dict(DEFAULT_OPTIONS)
+        self.options.update(options or {})
+        super(ProductionServer, self).__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
@@ -1,12 +1,8 @@
-import json
+from api_service.responses.json_response import ConstantJsonResponse
 
-from flask import make_response
-
-
-def assertion_failure_response():
-    data = {
+assertion_failure_response = ConstantJsonResponse(
+    {
         "message": "An internal error occurred, and has been raised with TAS. Sorry for the inconvenience."
-    }
-    response = make_response(json.dumps(data), 500)
-    response.headers['Content-type'] = "application/json"
-    return response
+    },
+    500
+)
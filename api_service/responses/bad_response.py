@@ -1,12 +1,25 @@
-import json
+import functools
 
-from flask import make_response
+from api_service.responses.json_response import encode_json, json_body_response, register_body_cache
 
+BAD_RESPONSE_CACHE_SIZE = 256
 
-def bad_response(message):
+
+# A client retrying a bad request in a loop gets the same message each time
+@functools.lru_cache(maxsize=BAD_RESPONSE_CACHE_SIZE)
+def _bad_response_body(message):
     data = {
         "message": message
     }
-    response = make_response(json.dumps(data), 400)
-    response.headers['Content-type'] = "application/json"
-    return response
+    return encode_json(data)
+
+
+register_body_cache(_bad_response_body.cache_clear)
+
+
+def bad_response(message):
+    if not isinstance(message, str):
+        # Only strings are cached: equal keys such as True, 1 and 1.0 would
+        # otherwise share a body, and lists of field errors aren't hashable
+        return json_body_response(encode_json({"message": message}), 400)
+    return json_body_response(_bad_response_body(message), 400)
@@ -1,6 +1,4 @@
-import json
-
-from flask import make_response
+from api_service.responses.json_response import json_response
 
 
 def invalid_permissions_response(message, permissions):
@@ -8,6 +6,4 @@ def invalid_permissions_response(message, permissions):
         "message": message,
         "permissions": permissions
     }
-    response = make_response(json.dumps(data), 400)
-    response.headers['Content-type'] = "application/json"
-    return response
+    return json_response(data, 400)
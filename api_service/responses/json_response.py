@@ -0,0 +1,83 @@
+import json
+
+from flask import Response
+
+JSON_CONTENT_TYPE = "application/json"
+
+
+def _default_encoder(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+_encoder = _default_encoder
+
+# Clear functions of every cache holding encoded bodies, run when the encoder changes
+_body_cache_clears = []
+
+
+def register_body_cache(clear):
+    _body_cache_clears.append(clear)
+
+
+def set_json_encoder(encoder):
+    # encoder takes a payload and returns the serialized bytes,
+    # e.g. orjson.dumps. Passing None restores the json module.
+    global _encoder
+    _encoder = encoder or _default_encoder
+    for clear in _body_cache_clears:
+        clear()
+
+
+def encode_json(data):
+    body = _encoder(data)
+    return body.encode('utf-8') if isinstance(body, str) else body
+
+
+def json_body_response(body, status=200):
+    response = Response(body, status=status)
+    response.headers['Content-type'] = JSON_CONTENT_TYPE
+    response.headers['Content-length'] = str(len(body))
+    return response
+
+
+def json_response(data, status=200):
+    return json_body_response(encode_json(data), status)
+
+
+class ConstantJsonResponse:
+    # The payload is serialized on first use and the bytes reused after that,
+    # each call still builds its own Response object around them
+
+    def __init__(self, data, status):
+        self._data = data
+        self._status = status
+        self._body = None
+        register_body_cache(self.clear)
+
+    def clear(self):
+        self._body = None
+
+    def __call__(self):
+        if self._body is None:
+            self._body = encode_json(self._data)
+        return json_body_response(self._body, self._status)
+
+
+def streamed_json_list(items, status=200, chunk_size=500):
+    def generate():
+        yield b'['
+        chunk = []
+        first = True
+        for item in items:
+            chunk.append(encode_json(item))
+            if len(chunk) >= chunk_size:
+                yield (b'' if first else b',') + b','.join(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b'' if first else b',') + b','.join(chunk)
+        yield b']'
+
+    response = Response(generate(), status=status)
+    response.headers['Content-type'] = JSON_CONTENT_TYPE
+    return response
@@ -0,0 +1,8 @@
+from api_service.responses.json_response import ConstantJsonResponse
+
+too_many_streams_response = ConstantJsonResponse(
+    {
+        "message": "Too many displays are connected to this server, try again shortly."
+    },
+    503
+)
@@ -1,88 +1,85 @@
-function ordinal_suffix_of(i) {
-    var j = i % 10,
-        k = i % 100;
-    if (j == 1 && k != 11) {
-        return "st";
-    }
-    if (j == 2 && k != 12) {
-        return "nd";
-    }
-    if (j == 3 && k != 13) {
-        return "rd";
-    }
-    return "th";
-}
-
-function checkTime(i)
+function fitToWidth(el)
 {
-    if (i<10)
-    {
-        i="0" + i;
-    }
-    return i;
+    var fontsizeBefore = parseFloat(window.getComputedStyle(el,null).getPropertyValue("font-size"));
+    var widthBefore = el.clientWidth;
+    var widthAfter = 200;
+    var scaleFactor = widthBefore/fontsizeBefore;
+    var fontsizeAfter = widthAfter/scaleFactor;
+
+    el.style.fontSize = fontsizeAfter + "px";
 }
 
-function setDate()
+function setText(id, text)
 {
-    var dayNames = [
-        "Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"
-    ];
-
-    var monthNames = [
-        "January", "February", "March",
-        "April", "May", "June",
-        "July", "August", "September",
-        "October", "November", "December"
-    ];
+    var el = document.getElementById(id);
 
-    var today=new Date();
-
-    var day = dayNames[today.getDay()];
-    var date = today.getDate();
-    var suffix = ordinal_suffix_of(date);
-    var month = monthNames[today.getMonth()];
+    if (el.textContent === text)
+    {
+        return;
+    }
 
-    document.getElementById('day').innerHTML=day;
-    document.getElementById('date').innerHTML=date+suffix+" "+month;
+    el.textContent = text;
 
-    t=setTimeout('startTime()',500);
+    if (el.classList.contains("dateentry"))
+    {
+        fitToWidth(el);
+    }
 }
 
-function setTime()
+function setClock(clock)
 {
-
-    var today=new Date();
-
-    var h=today.getHours();
-    var m=today.getMinutes();
-
-    h=checkTime(h);
-    m=checkTime(m);
-
-    document.getElementById("time").innerHTML=h+":"+m;
-
-
-    t=setTimeout('startUpdates()',500);
+    setText("day", clock.day);
+    setText("date", clock.date);
+    setText("time", clock.time);
 }
 
-function startUpdates()
+function setAgenda(agenda)
 {
+    var list = document.getElementById("agenda");
+    var fragment = document.createDocumentFragment();
+
+    agenda.events.forEach(function(event) {
+        var entry = document.createElement("div");
+        entry.className = "agendaentry";
+        entry.textContent = event.start + " " + event.title;
+        fragment.appendChild(entry);
+    });
+
+    list.textContent = "";
+    list.appendChild(fragment);
+}
 
-    setDate();
-    setTime();
-
-    var els = document.getElementsByClassName("dateentry");
-
-    i = 0;
-    while(!!els[i]){
-        var fontsizeBefore = parseFloat(window.getComputedStyle(els[i],null).getPropertyValue("font-size"));
-        var widthBefore = els[i].clientWidth;
-        var widthAfter = 200;
-        var scaleFactor = widthBefore/fontsizeBefore;
-        var fontsizeAfter = widthAfter/scaleFactor;
+var STREAM_RETRY_MILLISECONDS = 10000;
 
-        els[i].style.fontSize = fontsizeAfter + "px";
-        i++;
+function streamLocation(streamUrl, streamPort)
+{
+    // The evented stream server only speaks plain HTTP, pages served over
+    // TLS stay on their own origin and leave routing to the proxy
+    if (streamPort === null || window.location.protocol !== "http:")
+    {
+        return streamUrl;
     }
+    return "http://" + window.location.hostname + ":" + streamPort + "/stream";
+}
 
-}
\ No newline at end of file
+function startUpdates(streamUrl, streamPort)
+{
+    var source = new EventSource(streamLocation(streamUrl, streamPort));
+
+    // The browser reconnects dropped streams itself, but gives up on one the
+    // server refused, e.g. when it is at its display limit
+    source.onerror = function() {
+        if (source.readyState === EventSource.CLOSED)
+        {
+            setTimeout(function() { startUpdates(streamUrl, streamPort); }, STREAM_RETRY_MILLISECONDS);
+        }
+    };
+
+    source.addEventListener("clock", function(e) {
+        setClock(JSON.parse(e.data));
+    });
+
+    source.addEventListener("agenda", function(e) {
+        setAgenda(JSON.parse(e.data));
+    });
+}
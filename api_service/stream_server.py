@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import threading
+
+from api_service.clock_stream import HEARTBEAT_SECONDS, RECONNECT_MILLISECONDS
+
+# A display that stops reading is dropped once this much is queued for it,
+# its browser reconnects and starts again from the latest frames
+MAX_BUFFERED_BYTES = 64 * 1024
+
+REQUEST_TIMEOUT_SECONDS = 10
+
+MAX_REQUEST_BYTES = 8 * 1024
+
+STREAM_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"X-Accel-Buffering: no\r\n"
+    # The page is served from the main port, so this is a cross-origin stream
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+)
+
+NOT_FOUND = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+KEEPALIVE = b": keepalive\n\n"
+
+logger = logging.getLogger(__name__)
+
+
+# Serves /stream for every display from one asyncio event loop on a thread
+# of its own, on a port of its own. An open display costs a socket and a
+# suspended coroutine rather than a server thread, so a worker holds
+# thousands of them on two threads: the loop, and a pump that waits on the
+# broadcaster and hands each change to the loop. Every display is sent the
+# frames newer than the last ones it got, joined once per round for all
+# displays that are equally far behind.
+#
+# Several worker processes can bind the same port, the kernel spreads new
+# connections between them.
+class StreamServer:
+
+    def __init__(self, broadcaster, host='0.0.0.0', port=0, heartbeat=HEARTBEAT_SECONDS, reuse_port=True):
+        self._broadcaster = broadcaster
+        self._host = host
+        self._port = port
+        self._heartbeat = heartbeat
+        self._reuse_port = reuse_port
+        self._clients = {}
+        self._loop = None
+        self._stopping = None
+        self._started = threading.Event()
+        self._stopped = threading.Event()
+        self._error = None
+        self._threads = []
+
+    def get_port(self):
+        return self._port
+
+    def get_client_count(self):
+        return len(self._clients)
+
+    def is_running(self):
+        return bool(self._threads) and all(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        if self._threads:
+            return
+        self._started.clear()
+        self._stopped.clear()
+        self._error = None
+        serve = threading.Thread(target=self._run, name="stream-server")
+        serve.daemon = True
+        serve.start()
+        self._started.wait()
+        if self._error is not None:
+            serve.join()
+            raise self._error
+
+        pump = threading.Thread(target=self._pump, name="stream-pump")
+        pump.daemon = True
+        pump.start()
+        self._threads = [serve, pump]
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        if self._loop is not None and self._stopping is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stopping.set)
+            except RuntimeError:
+                pass
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve())
+        except Exception as e:
+            self._error = e
+            self._started.set()
+        finally:
+            self._loop.close()
+
+    async def _serve(self):
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self._host, self._port, reuse_port=self._reuse_port,
+                                            limit=MAX_REQUEST_BYTES)
+        self._port = server.sockets[0].getsockname()[1]
+        self._started.set()
+
+        await self._stopping.wait()
+        server.close()
+        for writer in list(self._clients):
+            writer.close()
+        self._clients.clear()
+        await server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), REQUEST_TIMEOUT_SECONDS)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+
+        request_line = head.split(b"\r\n", 1)[0].split()
+        if len(request_line) < 2 or request_line[0] != b"GET" or request_line[1].split(b"?")[0] != b"/stream":
+            writer.write(NOT_FOUND)
+            writer.close()
+            return
+
+        sequence, entries = self._broadcaster.get_snapshot()
+        writer.write(STREAM_HEADERS + "retry: {0}\n\n".format(RECONNECT_MILLISECONDS).encode('utf-8') +
+                     b''.join(frame for entry_sequence, frame in entries))
+        self._clients[writer] = sequence
+        try:
+            # Displays never send anything more, this only waits for them to go
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+
+    def _pump(self):
+        seen = self._broadcaster.get_sequence()
+        while not self._stopped.is_set():
+            sequence = self._broadcaster.wait_for_change(seen, self._heartbeat)
+            if self._stopped.is_set():
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._deliver, sequence == seen)
+            except RuntimeError:
+                # The loop has already closed
+                return
+            seen = sequence
+
+    def _deliver(self, heartbeat):
+        sequence, entries = self._broadcaster.get_snapshot()
+        chunks = {}
+        for writer, seen in list(self._clients.items()):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > MAX_BUFFERED_BYTES:
+                self._clients.pop(writer, None)
+                writer.close()
+                continue
+
+            if seen < sequence:
+                if seen not in chunks:
+                    chunks[seen] = b''.join(frame for entry_sequence, frame in entries if entry_sequence > seen)
+                writer.write(chunks[seen])
+                self._clients[writer] = sequence
+            elif heartbeat:
+                writer.write(KEEPALIVE)
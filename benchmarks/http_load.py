@@ -0,0 +1,74 @@
+import argparse
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_client(url, requests_per_client, latencies, errors):
+    # One keep-alive connection per client, like a display reusing its socket
+    parsed = urllib.parse.urlparse(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+    path = parsed.path or '/'
+
+    for i in range(requests_per_client):
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+    connection.close()
+
+
+def measure(url, concurrency, requests_per_client):
+    latencies = []
+    errors = []
+    clients = [
+        threading.Thread(target=run_client, args=(url, requests_per_client, latencies, errors))
+        for i in range(concurrency)
+    ]
+
+    started = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure request throughput of a running mirror service")
+    parser.add_argument('url', nargs='?', default='http://127.0.0.1:5000/')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200, help="Requests per concurrent client")
+    args = parser.parse_args()
+
+    print(json.dumps(measure(args.url, args.concurrency, args.requests), indent=4))
@@ -0,0 +1,9 @@
+# gunicorn loads this from the working directory, giving `gunicorn wsgi:application`
+# the same worker pool and hooks as run.py --production. Command line flags
+# still override any of these.
+from api_service.production_server import DEFAULT_OPTIONS, set_worker_environment
+
+# gunicorn reads this before it imports wsgi.py or forks any worker
+set_worker_environment()
+
+globals().update(DEFAULT_OPTIONS)
@@ -1,5 +1,64 @@
 #!flask/bin/python
-from api_service import application
-from api_service import flask_service
+import argparse
+import multiprocessing
+import os
 
-application.run(debug=False, host='0.0.0.0', use_reloader=True)
+from api_service import create_app, precompile, start_background_workers
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the mirror service")
+    parser.add_argument('--production', action='store_true',
+                        help="Serve through a pre-forked gunicorn worker pool instead of the development server")
+    parser.add_argument('--host', default=os.environ.get('MIRROR_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('MIRROR_PORT', 5000)))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.environ.get('MIRROR_WORKERS', multiprocessing.cpu_count())),
+                        help="Worker processes, each one imports and refreshes every calendar source itself")
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('MIRROR_THREADS', 64)),
+                        help="Threads per worker for pages, assets and fallback /stream requests")
+    parser.add_argument('--stream-port', type=int, default=os.environ.get('MIRROR_STREAM_PORT'),
+                        help="Port displays stream from, defaults to --port + 1 in production")
+    parser.add_argument('--calendars', default=os.environ.get('MIRROR_CALENDAR_SOURCES'),
+                        help="JSON file listing the calendar sources to keep refreshed")
+    parser.add_argument('--keep-alive', type=int, default=int(os.environ.get('MIRROR_KEEP_ALIVE', 5)),
+                        help="Seconds to hold idle keep-alive connections open")
+    return parser.parse_args()
+
+
+def start_worker(application, calendars):
+    precompile(application)
+    start_background_workers(calendars)
+
+
+def run_production(application, args):
+    # gunicorn is only needed in production, the dev server has no such dependency
+    from api_service.production_server import ProductionServer
+
+    if args.calendars:
+        # Workers read their sources from the environment in post_worker_init
+        os.environ['MIRROR_CALENDAR_SOURCES'] = args.calendars
+    ProductionServer(application, {
+        'bind': '{0}:{1}'.format(args.host, args.port),
+        'workers': args.workers,
+        'threads': args.threads,
+        'keepalive': args.keep_alive,
+    }).run()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.stream_port is not None:
+        # Read by start_background_workers in every worker
+        os.environ['MIRROR_STREAM_PORT'] = str(args.stream_port)
+    if args.production:
+        from api_service.production_server import set_worker_environment
+        set_worker_environment(args.port + 1)
+    application = create_app()
+    if args.production:
+        run_production(application, args)
+    else:
+        # With the reloader on, only the child process that serves requests refreshes calendars
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_worker(application, args.calendars)
+        application.run(debug=False, host=args.host, port=args.port, use_reloader=True)
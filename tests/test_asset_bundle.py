@@ -0,0 +1,48 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from api_service.asset_bundle import AssetBundle, minify_css, minify_js
+
+
+class TestAssetBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.makedirs(os.path.join(self.directory, 'styles'))
+
+    def write(self, name, text):
+        with open(os.path.join(self.directory, name), 'w') as asset_file:
+            asset_file.write(text)
+
+    def test_minify_css(self):
+        css = "/* layout */\nbody {\n    color: white;\n    margin: 0 auto;\n}\n\na > b, c {\n  top: 0;\n}\n"
+        self.assertEqual(minify_css(css), "body{color:white;margin:0 auto}a>b,c{top:0}")
+
+    def test_minify_js_keeps_line_breaks(self):
+        js = "// clock\nfunction a()\n{\n    var url = \"http://example.com\";\n\n    return url\n}\n"
+        self.assertEqual(minify_js(js), "function a()\n{\nvar url = \"http://example.com\";\nreturn url\n}")
+
+    def test_bundle_fingerprints_and_precompresses(self):
+        self.write('styles/site.css', "body {\n    color: white;\n}\n" * 50)
+        self.write('readme.txt', "not an asset")
+        bundle = AssetBundle(self.directory)
+
+        asset = bundle.get('styles/site.css')
+        self.assertEqual(asset.mimetype, "text/css; charset=utf-8")
+        self.assertEqual(gzip.decompress(asset.variants['gzip']), asset.variants[None])
+        assert bundle.get('readme.txt') is None
+
+        self.write('styles/site.css', "body {\n    color: black;\n}\n")
+        assert AssetBundle(self.directory).get('styles/site.css').fingerprint != asset.fingerprint
+
+    def test_small_assets_are_not_compressed(self):
+        self.write('styles/tiny.css', "a{top:0}")
+        self.assertEqual(list(AssetBundle(self.directory).get('styles/tiny.css').variants), [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
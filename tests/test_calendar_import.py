@@ -0,0 +1,233 @@
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from api_service.calendar_import import CalendarImporter, ICS, JSON_LINES, unfold_lines, parse_ics_duration
+from api_service.objects.event_store import EventStore
+
+ICS_CALENDAR = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VEVENT
+UID:dentist@example.com
+DTSTART:20160322T100000
+DTEND:20160322T110000
+SUMMARY:Dentist\\, with Sam
+END:VEVENT
+BEGIN:VEVENT
+UID:bins@example.com
+DTSTART;VALUE=DATE:20160321
+RRULE:FREQ=WEEKLY;BYDAY=MO
+SUMMARY:Put the bins
+  out
+END:VEVENT
+BEGIN:VEVENT
+UID:party@example.com
+DTSTART:20160322T190000
+DURATION:PT3H
+SUMMARY:Party
+END:VEVENT
+BEGIN:VEVENT
+UID:cancelled@example.com
+DTSTART:20160322T120000
+DTEND:20160322T130000
+STATUS:CANCELLED
+SUMMARY:Cancelled lunch
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+STANDUP_CALENDAR = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:standup@example.com
+RECURRENCE-ID:20160322T090000
+DTSTART:20160322T140000
+DTEND:20160322T141500
+SUMMARY:Standup (moved)
+END:VEVENT
+BEGIN:VEVENT
+UID:standup@example.com
+DTSTART:20160321T090000
+DTEND:20160321T091500
+RRULE:FREQ=DAILY
+EXDATE:20160323T090000
+EXDATE;VALUE=DATE:20160325
+SUMMARY:Standup
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def json_lines(*events):
+    return [json.dumps(event) + "\n" for event in events]
+
+
+class TestCalendarImport(unittest.TestCase):
+
+    def setUp(self):
+        self.store = EventStore()
+        self.importer = CalendarImporter(self.store, 'family')
+        self.day = datetime.date(2016, 3, 22)
+
+    def titles_on(self, day):
+        return [event.title for event in self.store.get_events_on(day)]
+
+    def test_unfold_lines(self):
+        self.assertEqual(list(unfold_lines(["SUMMARY:a\r\n", " b\r\n", "\tc\r\n", "UID:1\r\n"])),
+                         ["SUMMARY:abc", "UID:1"])
+
+    def test_parse_ics_duration(self):
+        self.assertEqual(parse_ics_duration("P1W2DT3H4M5S"), datetime.timedelta(days=9, hours=3, minutes=4, seconds=5))
+        self.assertEqual(parse_ics_duration("-PT15M"), datetime.timedelta(minutes=-15))
+
+    def test_import_ics(self):
+        result = self.importer.sync_lines(io.StringIO(ICS_CALENDAR), ICS)
+
+        self.assertEqual(result['added'], 3)
+        self.assertEqual(self.titles_on(self.day), ["Dentist, with Sam", "Party"])
+        self.assertEqual(self.titles_on(datetime.date(2016, 4, 4)), ["Put the bins out"])
+
+    def test_resync_only_touches_changed_entries(self):
+        self.importer.sync_lines(io.StringIO(ICS_CALENDAR), ICS)
+        dentist = self.store.get_by_key('family', 'dentist@example.com')
+
+        changed = ICS_CALENDAR.replace("SUMMARY:Party", "SUMMARY:Birthday party")
+        changed = changed.replace("UID:bins@example.com", "UID:recycling@example.com")
+        result = self.importer.sync_lines(io.StringIO(changed), ICS)
+
+        self.assertEqual(result, {"added": 1, "updated": 1, "removed": 1, "unchanged": 2, "invalid": 0,
+                                  "skipped": False})
+        assert self.store.get_by_key('family', 'dentist@example.com') is dentist
+        assert self.store.get_by_key('family', 'bins@example.com') is None
+        self.assertEqual(self.titles_on(self.day), ["Dentist, with Sam", "Birthday party"])
+        self.assertEqual(self.store.get_size(), 3)
+
+    def test_cancelling_an_event_removes_it(self):
+        self.importer.sync_lines(io.StringIO(ICS_CALENDAR), ICS)
+        cancelled = ICS_CALENDAR.replace("SUMMARY:Party", "STATUS:CANCELLED\nSUMMARY:Party")
+        result = self.importer.sync_lines(io.StringIO(cancelled), ICS)
+
+        self.assertEqual(result['removed'], 1)
+        self.assertEqual(self.titles_on(self.day), ["Dentist, with Sam"])
+
+    def standups_on(self, day):
+        return [(event.title, event.start.hour) for event in self.store.get_events_on(day)]
+
+    def test_exdates_and_modified_instances_replace_occurrences(self):
+        self.importer.sync_lines(io.StringIO(STANDUP_CALENDAR), ICS)
+
+        self.assertEqual(self.standups_on(self.day), [("Standup (moved)", 14)])
+        self.assertEqual(self.standups_on(datetime.date(2016, 3, 23)), [])
+        self.assertEqual(self.standups_on(datetime.date(2016, 3, 24)), [("Standup", 9)])
+        self.assertEqual(self.standups_on(datetime.date(2016, 3, 25)), [])
+
+        version = self.store.get_version()
+        self.importer.sync_lines(io.StringIO(STANDUP_CALENDAR), ICS)
+        self.assertEqual(self.store.get_version(), version)
+
+        # Dropping the modified instance brings the original occurrence back
+        master_only = STANDUP_CALENDAR[:STANDUP_CALENDAR.index("BEGIN:VEVENT")] + \
+            STANDUP_CALENDAR[STANDUP_CALENDAR.index("END:VEVENT") + len("END:VEVENT\n"):]
+        self.importer.sync_lines(io.StringIO(master_only), ICS)
+        self.assertEqual(self.standups_on(self.day), [("Standup", 9)])
+        self.assertEqual(self.standups_on(datetime.date(2016, 3, 23)), [])
+
+    def test_import_json_lines_deduplicates_by_uid(self):
+        lines = json_lines(
+            {"uid": 1, "start": "2016-03-22T10:00:00", "end": "2016-03-22T11:00:00", "title": "Dentist"},
+            {"uid": 2, "start": "2016-03-22T12:00", "end": "2016-03-22T13:00", "title": "Lunch"},
+            {"uid": 1, "start": "2016-03-22T15:00:00", "end": "2016-03-22T16:00:00", "title": "Dentist (moved)"},
+            {"start": "2016-03-22 18:00", "end": "2016-03-22 19:00", "title": "Dinner"},
+        )
+        self.importer.sync_lines(lines, JSON_LINES)
+
+        self.assertEqual(self.titles_on(self.day), ["Dentist", "Lunch", "Dinner"])
+
+        result = self.importer.sync_lines(lines, JSON_LINES)
+        self.assertEqual(result['added'] + result['updated'] + result['removed'], 0)
+        self.assertEqual(self.store.get_size(), 3)
+
+    def test_invalid_entries_are_counted_and_skipped(self):
+        lines = json_lines(
+            {"uid": 1, "start": "2016-03-22T10:00:00", "end": "2016-03-22T09:00:00", "title": "Backwards"},
+            {"uid": 2, "start": "yesterday", "title": "Unparseable"},
+            {"uid": 3, "start": "2016-03-22T12:00", "end": "2016-03-22T13:00", "title": "Lunch"},
+        )
+        result = self.importer.sync_lines(lines, JSON_LINES)
+
+        self.assertEqual(result['invalid'], 2)
+        self.assertEqual(self.titles_on(self.day), ["Lunch"])
+
+    def test_entry_turning_invalid_is_removed_and_stays_invalid(self):
+        valid = {"uid": "b", "start": "2016-03-22T12:00", "end": "2016-03-22T13:00", "title": "B"}
+        lunch = {"uid": "l", "start": "2016-03-22T14:00", "end": "2016-03-22T15:00", "title": "Lunch"}
+        self.importer.sync_lines(json_lines(valid, lunch), JSON_LINES)
+
+        backwards = dict(valid, end="2016-03-22T11:00")
+        result = self.importer.sync_lines(json_lines(backwards, lunch), JSON_LINES)
+        self.assertEqual((result['invalid'], result['removed'], result['unchanged']), (1, 1, 1))
+        self.assertEqual(self.titles_on(self.day), ["Lunch"])
+
+        result = self.importer.sync_lines(json_lines(backwards, lunch), JSON_LINES)
+        self.assertEqual((result['invalid'], result['removed'], result['unchanged']), (1, 0, 1))
+
+        unsupported = dict(valid, rrule="FREQ=MONTHLY;BYDAY=2TU")
+        result = self.importer.sync_lines(json_lines(unsupported, lunch), JSON_LINES)
+        self.assertEqual(result['invalid'], 1)
+
+        result = self.importer.sync_lines(json_lines(valid, lunch), JSON_LINES)
+        self.assertEqual(result['added'], 1)
+        self.assertEqual(self.titles_on(self.day), ["B", "Lunch"])
+
+    def test_sync_applies_in_one_update_and_not_at_all_if_the_read_fails(self):
+        self.importer.sync_lines(io.StringIO(STANDUP_CALENDAR), ICS)
+        version = self.store.get_version()
+
+        def failing_read():
+            lines = STANDUP_CALENDAR.replace("DTSTART:20160322T140000", "DTSTART:20160322T150000").splitlines(True)
+            for index, line in enumerate(lines):
+                if index == 9:
+                    raise OSError("Connection reset")
+                yield line
+
+        with self.assertRaises(OSError):
+            self.importer.sync_lines(failing_read(), ICS)
+        self.assertEqual(self.store.get_version(), version)
+        self.assertEqual(self.standups_on(self.day), [("Standup (moved)", 14)])
+
+        moved = STANDUP_CALENDAR.replace("DTSTART:20160322T140000", "DTSTART:20160322T150000")
+        result = self.importer.sync_lines(io.StringIO(moved), ICS)
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(self.store.get_version(), version + 1)
+        self.assertEqual(self.standups_on(self.day), [("Standup (moved)", 15)])
+
+    def test_lines_that_are_not_json_objects_are_invalid(self):
+        lines = ['{"uid": 1, "start": "2016-03-22T10:00"\n', '[1, 2]\n', '"Lunch"\n'] + json_lines(
+            {"uid": 3, "start": "2016-03-22T12:00", "end": "2016-03-22T13:00", "title": "Lunch"},
+        )
+        result = self.importer.sync_lines(lines, JSON_LINES)
+
+        self.assertEqual(result['invalid'], 3)
+        self.assertEqual(result['added'], 1)
+        self.assertEqual(self.titles_on(self.day), ["Lunch"])
+
+    def test_sync_file_skips_unchanged_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "family.ics")
+        with open(path, 'w') as calendar_file:
+            calendar_file.write(ICS_CALENDAR)
+
+        assert not self.importer.sync_file(path)['skipped']
+        version = self.store.get_version()
+
+        assert self.importer.sync_file(path)['skipped']
+        self.assertEqual(self.store.get_version(), version)
+
+
+if __name__ == '__main__':
+    unittest.main()
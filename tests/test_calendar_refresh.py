@@ -0,0 +1,155 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from api_service.agenda import Agenda
+from api_service.calendar_refresh import CalendarRefresher, CalendarSource, load_calendar_sources
+from api_service.objects.event_store import EventStore
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCalendarRefresh(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        self.now = datetime.datetime.now().replace(second=0, microsecond=0)
+        self.clock = FakeClock()
+        self.store = EventStore()
+        self.agenda = Agenda(self.store)
+        self.refresher = CalendarRefresher(self.store, clock=self.clock)
+
+    def write_calendar(self, name, *titles):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as calendar_file:
+            for index, title in enumerate(titles):
+                start = self.now + datetime.timedelta(hours=index + 1)
+                calendar_file.write(json.dumps({
+                    "uid": title,
+                    "start": start.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "end": (start + datetime.timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%S"),
+                    "title": title,
+                }) + "\n")
+        return path
+
+    def agenda_titles(self):
+        self.agenda.refresh(self.now)
+        return [item['title'] for item in self.agenda.get_items()]
+
+    def test_refresh_imports_sources_and_reports_status(self):
+        self.refresher.add_source(CalendarSource('family', self.write_calendar('family.jsonl', 'Dentist', 'Dinner'),
+                                                 interval=300))
+
+        self.assertEqual(self.refresher.run_pending(), 300)
+        self.assertEqual(self.agenda_titles(), ['Dentist', 'Dinner'])
+
+        status = self.refresher.dump_status()[0]
+        self.assertEqual(status['name'], 'family')
+        self.assertEqual(status['last_result']['added'], 2)
+        assert status['last_refresh'] is not None
+        assert status['last_duration_seconds'] is not None
+
+    def test_refresh_listeners_run_after_a_source_refreshes(self):
+        versions = []
+        self.refresher.add_refresh_listener(lambda: versions.append(self.store.get_version()))
+        self.assertIsNone(self.refresher.run_pending())
+
+        self.refresher.add_source(CalendarSource('family', self.write_calendar('family.jsonl', 'Dentist'), interval=300))
+        self.refresher.run_pending()
+        self.refresher.run_pending()
+        self.assertEqual(versions, [1])
+
+    def test_sources_only_refresh_when_due(self):
+        path = self.write_calendar('family.jsonl', 'Dentist')
+        self.refresher.add_source(CalendarSource('family', path, interval=300))
+        self.refresher.run_pending()
+
+        self.write_calendar('family.jsonl', 'Dentist', 'Dinner')
+        os.utime(path, (time.time() + 10, time.time() + 10))
+
+        self.clock.now += 299
+        self.refresher.run_pending()
+        self.assertEqual(self.agenda_titles(), ['Dentist'])
+
+        self.clock.now += 1
+        self.refresher.run_pending()
+        self.assertEqual(self.agenda_titles(), ['Dentist', 'Dinner'])
+
+    def test_failing_source_backs_off(self):
+        source = CalendarSource('missing', os.path.join(self.directory, 'missing.ics'), interval=60)
+        self.refresher.add_source(source)
+
+        self.refresher.run_pending()
+        self.assertEqual(source.failures, 1)
+        assert 'FileNotFoundError' in source.last_error
+        self.assertEqual(source.next_run, self.clock.now + 120)
+
+        self.clock.now = source.next_run
+        self.refresher.run_pending()
+        self.assertEqual(source.next_run, self.clock.now + 240)
+
+    def test_load_calendar_sources_resolves_relative_paths(self):
+        path = os.path.join(self.directory, 'sources.json')
+        with open(path, 'w') as sources_file:
+            json.dump([{"name": "family", "location": "family.ics", "interval": 60},
+                       {"name": "school", "location": "https://example.com/school.ics"}], sources_file)
+
+        family, school = load_calendar_sources(path)
+        self.assertEqual(family.location, os.path.join(self.directory, 'family.ics'))
+        self.assertEqual(family.interval, 60)
+        assert school.is_remote()
+
+    def test_background_thread_starts_and_stops(self):
+        refresher = CalendarRefresher(self.store)
+        refresher.add_source(CalendarSource('family', self.write_calendar('family.jsonl', 'Dentist')))
+        refresher.start()
+        try:
+            deadline = time.time() + 5
+            while not self.agenda_titles() and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(self.agenda_titles(), ['Dentist'])
+        finally:
+            refresher.stop(timeout=5)
+        assert not refresher.is_running()
+
+    def test_background_thread_survives_a_failing_pass(self):
+        refreshes = []
+
+        def listener():
+            refreshes.append(self.store.get_version())
+            if len(refreshes) == 1:
+                raise RuntimeError("Listener failed")
+
+        refresher = CalendarRefresher(self.store)
+        refresher.add_refresh_listener(listener)
+        refresher.add_source(CalendarSource('family', self.write_calendar('family.jsonl', 'Dentist')))
+        with self.assertLogs('api_service.calendar_refresh', 'ERROR'):
+            refresher.start()
+            try:
+                deadline = time.time() + 5
+                while not refreshes and time.time() < deadline:
+                    time.sleep(0.01)
+                refresher.add_source(CalendarSource('school', self.write_calendar('school.jsonl', 'Assembly')))
+                while len(refreshes) < 2 and time.time() < deadline:
+                    time.sleep(0.01)
+                assert refresher.is_running()
+            finally:
+                refresher.stop(timeout=5)
+        self.assertEqual(sorted(self.agenda_titles()), ['Assembly', 'Dentist'])
+
+
+if __name__ == '__main__':
+    unittest.main()
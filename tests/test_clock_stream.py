@@ -0,0 +1,153 @@
+import datetime
+import json
+import threading
+import unittest
+
+from api_service.agenda import Agenda
+from api_service.broadcast import Broadcaster
+from api_service.calendar_refresh import CalendarRefresher, CalendarSource
+from api_service.clock_stream import ClockTicker, clock_stream, format_clock, publish_state
+from api_service.objects.event import Event
+from api_service.objects.event_store import EventStore
+
+
+def parse_events(chunk):
+    events = []
+    for frame in chunk.decode('utf-8').strip().split("\n\n"):
+        lines = frame.split("\n")
+        events.append((lines[0][len("event: "):], json.loads(lines[1][len("data: "):])))
+    return events
+
+
+class TestClockStream(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime(2016, 3, 22, 9, 5, 30)
+        self.agenda = Agenda()
+        self.broadcaster = Broadcaster()
+
+    def test_format_clock(self):
+        self.assertEqual(format_clock(self.now), {"day": "Tuesday", "date": "22nd March", "time": "09:05"})
+        self.assertEqual(format_clock(datetime.datetime(2016, 3, 11, 23, 59))['date'], "11th March")
+        self.assertEqual(format_clock(datetime.datetime(2016, 3, 1, 0, 0))['date'], "1st March")
+
+    def test_stream_sends_current_clock_and_agenda_on_connect(self):
+        publish_state(self.broadcaster, self.agenda, self.now)
+        stream = clock_stream(self.broadcaster.subscribe())
+
+        assert next(stream).startswith(b"retry:")
+
+        events = parse_events(next(stream))
+        self.assertEqual(events, [("clock", format_clock(self.now)), ("agenda", {"version": 0, "events": []})])
+
+    def test_publishing_the_same_minute_does_not_wake_subscribers(self):
+        publish_state(self.broadcaster, self.agenda, self.now)
+        sequence = self.broadcaster.get_sequence()
+
+        publish_state(self.broadcaster, self.agenda, self.now + datetime.timedelta(seconds=20))
+        self.assertEqual(self.broadcaster.get_sequence(), sequence)
+
+        publish_state(self.broadcaster, self.agenda, self.now + datetime.timedelta(seconds=40))
+        self.assertEqual(self.broadcaster.get_sequence(), sequence + 1)
+
+    def test_stream_pushes_agenda_change_to_waiting_subscriber(self):
+        publish_state(self.broadcaster, self.agenda, self.now)
+        stream = clock_stream(self.broadcaster.subscribe())
+        next(stream)
+        next(stream)
+
+        def change_agenda():
+            self.agenda.publish([{"title": "Dentist", "start": "10:00", "end": "11:00"}])
+            publish_state(self.broadcaster, self.agenda, self.now)
+
+        threading.Timer(0.05, change_agenda).start()
+
+        events = parse_events(next(stream))
+        self.assertEqual(events[0][0], "agenda")
+        self.assertEqual(events[0][1]['version'], 1)
+        self.assertEqual(events[0][1]['events'][0]['title'], "Dentist")
+
+    def test_idle_stream_sends_heartbeat(self):
+        stream = clock_stream(self.broadcaster.subscribe(), heartbeat=0.01)
+        next(stream)
+        self.assertEqual(next(stream), b": keepalive\n\n")
+
+    def test_slow_subscriber_only_gets_latest_frames(self):
+        subscription = self.broadcaster.subscribe()
+        for minute in range(10):
+            publish_state(self.broadcaster, self.agenda, self.now + datetime.timedelta(minutes=minute))
+
+        frames = subscription.next_frames(timeout=0)
+        self.assertEqual(len(frames), 2)
+        self.assertEqual(parse_events(frames[-1]), [("clock", format_clock(self.now + datetime.timedelta(minutes=9)))])
+
+    def test_closed_subscriptions_are_released(self):
+        subscriptions = [self.broadcaster.subscribe() for i in range(1000)]
+        self.assertEqual(self.broadcaster.get_subscriber_count(), 1000)
+
+        for subscription in subscriptions:
+            subscription.close()
+            subscription.close()
+        self.assertEqual(self.broadcaster.get_subscriber_count(), 0)
+
+    def test_subscriptions_stop_at_the_cap(self):
+        self.broadcaster.set_max_subscribers(2)
+        first = self.broadcaster.subscribe()
+        assert self.broadcaster.subscribe() is not None
+        assert self.broadcaster.subscribe() is None
+
+        first.close()
+        assert self.broadcaster.subscribe() is not None
+
+    def test_closing_stream_unsubscribes(self):
+        stream = clock_stream(self.broadcaster.subscribe())
+        next(stream)
+        self.assertEqual(self.broadcaster.get_subscriber_count(), 1)
+
+        stream.close()
+        self.assertEqual(self.broadcaster.get_subscriber_count(), 0)
+
+    def test_ticker_refreshes_agenda_and_publishes_until_next_minute(self):
+        store = EventStore([Event(datetime.datetime(2016, 3, 22, 10), datetime.datetime(2016, 3, 22, 11), 'Dentist')])
+        ticker = ClockTicker(Agenda(store), self.broadcaster)
+        subscription = self.broadcaster.subscribe()
+
+        self.assertEqual(ticker.tick(self.now), 30)
+
+        events = parse_events(b''.join(subscription.next_frames(timeout=0)))
+        self.assertEqual(events[0], ("clock", format_clock(self.now)))
+        self.assertEqual([item['title'] for item in events[1][1]['events']], ['Dentist'])
+
+    def test_ticker_keeps_publishing_while_a_calendar_import_is_stuck(self):
+        release = threading.Event()
+
+        class StuckSource(CalendarSource):
+            def sync(self, importer):
+                release.wait(5)
+                return {}
+
+        store = EventStore()
+        refresher = CalendarRefresher(store)
+        refresher.add_source(StuckSource('stuck', 'stuck.ics'))
+        ticker = ClockTicker(Agenda(store), self.broadcaster, clock=lambda: self.now)
+        refresher.add_refresh_listener(ticker.wake)
+
+        refresher.start()
+        ticker.start()
+        self.addCleanup(refresher.stop, 5)
+        self.addCleanup(ticker.stop, 5)
+        self.addCleanup(release.set)
+
+        subscription = self.broadcaster.subscribe()
+        frames = subscription.next_frames(timeout=5)
+        self.assertEqual(parse_events(frames[0])[0], ("clock", format_clock(self.now)))
+
+        store.add(Event(datetime.datetime(2016, 3, 22, 10), datetime.datetime(2016, 3, 22, 11), 'Dentist'))
+        ticker.wake()
+        events = parse_events(b''.join(subscription.next_frames(timeout=5)))
+        self.assertEqual(events[0][0], "agenda")
+        self.assertEqual(events[0][1]['events'][0]['title'], "Dentist")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import datetime
+import random
+import unittest
+
+from api_service.agenda import Agenda
+from api_service.objects.event import Event
+from api_service.objects.event_store import EventStore, LONG_EVENT_DURATION
+
+
+def hours_from(start, hours):
+    return start + datetime.timedelta(hours=hours)
+
+
+class TestEventStore(unittest.TestCase):
+
+    def setUp(self):
+        self.midnight = datetime.datetime(2016, 3, 22)
+        self.store = EventStore()
+
+    def test_event_rejects_end_before_start(self):
+        with self.assertRaises(AssertionError):
+            Event(hours_from(self.midnight, 2), self.midnight, 'Backwards')
+
+    def test_event_has_no_instance_dict(self):
+        event = Event(self.midnight, hours_from(self.midnight, 1), 'Breakfast')
+        with self.assertRaises(AttributeError):
+            event.colour = 'red'
+
+    def test_events_on_day(self):
+        breakfast = Event(hours_from(self.midnight, 8), hours_from(self.midnight, 9), 'Breakfast')
+        yesterday = Event(hours_from(self.midnight, -10), hours_from(self.midnight, -9), 'Yesterday')
+        tomorrow = Event(hours_from(self.midnight, 30), hours_from(self.midnight, 31), 'Tomorrow')
+        overnight = Event(hours_from(self.midnight, -2), hours_from(self.midnight, 6), 'Overnight')
+
+        self.store.add_all([breakfast, yesterday, tomorrow])
+        self.store.add(overnight)
+
+        self.assertEqual(self.store.get_size(), 4)
+        self.assertEqual(self.store.get_events_on(self.midnight.date()), [overnight, breakfast])
+
+    def test_upcoming_matches_linear_scan(self):
+        events = []
+        for i in range(2000):
+            start = hours_from(self.midnight, random.uniform(-500, 500))
+            events.append(Event(start, hours_from(start, random.uniform(0, 48)), 'Event {0}'.format(i)))
+        self.store.add_all(events)
+
+        for i in range(50):
+            now = hours_from(self.midnight, random.uniform(-500, 500))
+            expected = [event for event in events if event.overlaps(now, hours_from(now, 6))]
+            actual = self.store.get_upcoming(now, 6)
+            self.assertEqual(sorted(actual, key=id), sorted(expected, key=id))
+
+    def test_long_events_do_not_widen_the_look_back(self):
+        holiday = Event(hours_from(self.midnight, -24 * 14), hours_from(self.midnight, 24 * 7), 'Holiday')
+        breakfast = Event(hours_from(self.midnight, 8), hours_from(self.midnight, 9), 'Breakfast')
+        self.store.add_all([holiday, breakfast])
+
+        assert self.store._max_duration <= LONG_EVENT_DURATION
+        self.assertEqual(self.store.get_upcoming(hours_from(self.midnight, 7), 6), [holiday, breakfast])
+        self.assertEqual(self.store.get_upcoming(hours_from(self.midnight, 24 * 8), 6), [])
+
+        assert self.store.remove(holiday)
+        self.assertEqual(self.store.get_upcoming(hours_from(self.midnight, 7), 6), [breakfast])
+
+    def test_remove(self):
+        event = Event(self.midnight, hours_from(self.midnight, 1), 'Breakfast')
+        self.store.add(event)
+        version = self.store.get_version()
+
+        assert self.store.remove(event)
+        assert not self.store.remove(event)
+        assert self.store.get_size() == 0
+        assert self.store.get_version() > version
+
+    def test_agenda_only_changes_version_when_store_changes(self):
+        agenda = Agenda(self.store)
+        now = hours_from(self.midnight, 7)
+
+        agenda.refresh(now)
+        version = agenda.get_version()
+        self.assertEqual(agenda.get_items(), ())
+
+        self.store.add(Event(hours_from(self.midnight, 8), hours_from(self.midnight, 9), 'Breakfast', source='family'))
+        agenda.refresh(now)
+        self.assertEqual(agenda.get_version(), version + 1)
+        self.assertEqual(agenda.get_items(), ({"title": "Breakfast", "start": "08:00", "end": "09:00", "source": "family"},))
+
+        agenda.refresh(hours_from(now, 0.5))
+        self.assertEqual(agenda.get_version(), version + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
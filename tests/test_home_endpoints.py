@@ -0,0 +1,200 @@
+import datetime
+import gzip
+import http.client
+import json
+import socket
+import threading
+import time
+import unittest
+
+import flask
+from werkzeug.serving import make_server
+
+import api_service
+from api_service import flask_service
+from api_service.objects.event import Event
+
+
+class TestHomeEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        api_service.application.config['TESTING'] = True
+        api_service.get_event_store().clear()
+        api_service.get_agenda().refresh()
+        flask_service.home_page.clear()
+
+        self.appl = api_service.application.test_client()
+
+    def tearDown(self):
+        api_service.get_event_store().clear()
+        api_service.get_agenda().refresh()
+
+    def add_event(self, title):
+        now = datetime.datetime.now()
+        api_service.get_event_store().add(Event(now, now + datetime.timedelta(hours=1), title))
+        api_service.get_agenda().refresh()
+
+    def test_home_returns_strong_etag(self):
+        rv = self.appl.get('/')
+        assert rv.status_code == 200
+        etag, weak = rv.get_etag()
+        assert etag and not weak
+        assert rv.headers['Cache-Control'] == "no-cache"
+
+    def test_home_returns_304_when_etag_matches(self):
+        etag = self.appl.get('/').get_etag()[0]
+
+        rv = self.appl.get('/', headers={"If-None-Match": '"{0}"'.format(etag)})
+        assert rv.status_code == 304
+        assert rv.data == b''
+
+    def test_home_changes_etag_when_agenda_changes(self):
+        etag = self.appl.get('/').get_etag()[0]
+
+        self.add_event("Dentist")
+
+        rv = self.appl.get('/', headers={"If-None-Match": '"{0}"'.format(etag)})
+        assert rv.status_code == 200
+        assert b"Dentist" in rv.data
+        assert rv.get_etag()[0] != etag
+
+    def test_home_inlines_minified_assets(self):
+        rv = self.appl.get('/')
+        assert b".dateentry{display:table}" in rv.data
+        assert b"function startUpdates(streamUrl, streamPort)" in rv.data
+        assert b"/static/" not in rv.data
+
+    def test_home_is_served_precompressed(self):
+        plain = self.appl.get('/')
+        rv = self.appl.get('/', headers={"Accept-Encoding": "gzip"})
+        assert rv.headers['Content-Encoding'] == "gzip"
+        assert rv.headers['Vary'] == "Accept-Encoding"
+        assert gzip.decompress(rv.data) == plain.data
+        assert rv.get_etag()[0] != plain.get_etag()[0]
+
+        rv = self.appl.get('/', headers={"Accept-Encoding": "gzip", "If-None-Match": rv.headers['ETag']})
+        assert rv.status_code == 304
+
+    def test_fingerprinted_assets_are_immutable(self):
+        with api_service.application.test_request_context():
+            url = flask_service.asset_url('scripts/datetime.js')
+
+        rv = self.appl.get(url)
+        assert rv.status_code == 200
+        assert rv.mimetype == "application/javascript"
+        assert "immutable" in rv.headers['Cache-Control']
+        assert b"EventSource" in rv.data
+
+        assert self.appl.get('/assets/0000000000000000/scripts/datetime.js').status_code == 404
+        assert self.appl.get('/assets/0000000000000000/missing.js').status_code == 404
+
+    def test_only_fingerprinted_static_assets_are_long_lived(self):
+        fingerprint = api_service.get_asset_bundle().get('styles/styles.css').fingerprint
+        rv = self.appl.get('/static/styles/styles.css?v={0}'.format(fingerprint))
+        assert rv.status_code == 200
+        assert "max-age={0}".format(api_service.STATIC_MAX_AGE_SECONDS) in rv.headers['Cache-Control']
+        rv.close()
+
+        for url in ('/static/styles/styles.css', '/static/styles/styles.css?v=stale'):
+            rv = self.appl.get(url)
+            assert rv.status_code == 200
+            assert "max-age={0}".format(api_service.STATIC_MAX_AGE_SECONDS) not in rv.headers.get('Cache-Control', '')
+            rv.close()
+
+    def test_static_urls_carry_asset_fingerprint(self):
+        with api_service.application.test_request_context():
+            fingerprint = api_service.get_asset_bundle().get('styles/styles.css').fingerprint
+            self.assertEqual(flask.url_for('static', filename='styles/styles.css'),
+                             '/static/styles/styles.css?v={0}'.format(fingerprint))
+            self.assertEqual(flask.url_for('static', filename='missing.png'), '/static/missing.png')
+
+    def test_stream_is_event_stream(self):
+        rv = self.appl.get('/stream', buffered=False)
+        assert rv.status_code == 200
+        assert rv.mimetype == "text/event-stream"
+        rv.close()
+
+    def test_metrics_reports_route_latency_status_and_render_time(self):
+        self.appl.get('/')
+        self.appl.get('/not-a-page')
+
+        rv = self.appl.get('/metrics')
+        assert rv.status_code == 200
+        assert rv.mimetype == "text/plain"
+
+        text = rv.data.decode('utf-8')
+        assert 'mirror_http_request_duration_seconds_bucket{route="/",le="+Inf"}' in text
+        assert 'mirror_http_requests_total{route="/",status="200"}' in text
+        assert 'mirror_http_requests_total{route="unmatched",status="404"}' in text
+        assert 'mirror_http_requests_in_flight ' in text
+        assert 'mirror_template_render_seconds_count{template="home.html"}' in text
+
+    def test_sources_reports_calendar_refresh_status(self):
+        rv = self.appl.get('/sources')
+        assert rv.status_code == 200
+        assert json.loads(rv.data) == api_service.get_calendar_refresher().dump_status()
+
+
+class TestStreamCapacity(unittest.TestCase):
+
+    STREAMS = 50
+
+    def setUp(self):
+        self.broadcaster = api_service.get_broadcaster()
+        self.broadcaster.set_max_subscribers(self.STREAMS)
+        self.addCleanup(self.broadcaster.set_max_subscribers, None)
+
+        self.server = make_server('127.0.0.1', 0, api_service.application, threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def open_stream(self):
+        connection = socket.create_connection(('127.0.0.1', self.server.server_port), timeout=5)
+        connection.sendall(b"GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        received = b''
+        while b"retry:" not in received:
+            chunk = connection.recv(4096)
+            if not chunk:
+                break
+            received += chunk
+        return connection, received
+
+    def get(self, path):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=5)
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response
+
+    def test_home_answers_while_streams_are_held_open(self):
+        baseline = self.broadcaster.get_subscriber_count()
+        streams = []
+        try:
+            for i in range(self.STREAMS - baseline):
+                connection, received = self.open_stream()
+                streams.append(connection)
+                assert b"200 OK" in received and b"retry:" in received
+
+            self.assertEqual(self.get('/').status, 200)
+
+            refused = self.get('/stream')
+            self.assertEqual(refused.status, 503)
+            assert int(refused.getheader('Retry-After')) > 0
+        finally:
+            for connection in streams:
+                connection.close()
+
+        # Writing the next frame to the closed connections releases their subscriptions
+        deadline = time.time() + 5
+        ping = 0
+        while self.broadcaster.get_subscriber_count() > baseline and time.time() < deadline:
+            ping += 1
+            self.broadcaster.publish("ping", ping, b": ping\n\n")
+            time.sleep(0.05)
+        self.assertEqual(self.broadcaster.get_subscriber_count(), baseline)
+
+
+if __name__ == '__main__':
+    unittest.main()
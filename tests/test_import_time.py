@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time of the package alone, measured with -X importtime.
+# Generous enough for a slow CI box, tight enough to catch a heavy import
+# (Flask alone costs several times this) creeping back in at module level.
+PACKAGE_IMPORT_BUDGET_MICROSECONDS = 50000
+
+HEAVY_MODULES = ('flask', 'jinja2', 'werkzeug', 'urllib.request', 'gunicorn')
+
+
+def run_python(*args):
+    return subprocess.run([sys.executable] + list(args), cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+def cumulative_import_time(module):
+    stderr = run_python('-X', 'importtime', '-c', 'import {0}'.format(module)).stderr
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() == module:
+            return int(cumulative)
+    raise AssertionError("No import time reported for '{0}'".format(module))
+
+
+def loaded_heavy_modules(code):
+    script = "{0}\nimport sys\nprint(','.join(m for m in {1!r} if m in sys.modules))".format(code, HEAVY_MODULES)
+    output = run_python('-c', script).stdout.strip()
+    return output.split(',') if output else []
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_package_import_is_within_budget(self):
+        # Best of three, the first run may also be paying to write .pyc files
+        best = min(cumulative_import_time('api_service') for i in range(3))
+        assert best <= PACKAGE_IMPORT_BUDGET_MICROSECONDS, \
+            "Importing api_service took {0}us, budget is {1}us".format(best, PACKAGE_IMPORT_BUDGET_MICROSECONDS)
+
+    def test_package_import_loads_no_heavy_modules(self):
+        self.assertEqual(loaded_heavy_modules("import api_service"), [])
+
+    def test_creating_app_does_not_start_unused_subsystems(self):
+        loaded = loaded_heavy_modules("import api_service\napi_service.create_app()")
+        assert 'flask' in loaded
+        assert 'urllib.request' not in loaded
+        assert 'gunicorn' not in loaded
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+from api_service.metrics import Metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_shards_of_finished_threads_are_retired(self):
+        metrics = Metrics()
+        for i in range(50):
+            thread = threading.Thread(target=metrics.observe_request, args=('/', 200, 0.01))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(len(metrics.get_shards()), 1)
+        assert 'mirror_http_requests_total{route="/",status="200"} 50' in metrics.dump_text()
+
+    def test_workers_share_counts_through_snapshot_directory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        exited_worker = Metrics(directory)
+        exited_worker.observe_request('/', 200, 0.01)
+        exited_worker.observe_request('/', 200, 0.01)
+        exited_worker._shard().in_flight += 1
+        exited_worker.publish_snapshot()
+
+        # Hand the snapshot to a pid that can't be running
+        with open(os.path.join(directory, '{0}.json'.format(os.getpid()))) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        snapshot['pid'] = 999999999
+        with open(os.path.join(directory, '999999999.json'), 'w') as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+
+        worker = Metrics(directory)
+        worker.observe_request('/', 200, 0.01)
+        text = worker.dump_text()
+
+        assert 'mirror_http_requests_total{route="/",status="200"} 3' in text
+        assert 'mirror_http_request_duration_seconds_count{route="/"} 3' in text
+        assert 'mirror_http_requests_in_flight 0' in text
+
+    def test_gunicorn_config_gives_workers_a_shared_snapshot_directory(self):
+        # What `gunicorn wsgi:application` does: read the config, then import the app
+        script = (
+            "import os, runpy\n"
+            "runpy.run_path('gunicorn.conf.py')\n"
+            "import wsgi, api_service\n"
+            "api_service.get_metrics().observe_request('/', 200, 0.01)\n"
+            "api_service.get_metrics().publish_snapshot()\n"
+            "print(os.environ['MIRROR_METRICS_DIR'])\n"
+        )
+        environment = dict(os.environ)
+        environment.pop('MIRROR_METRICS_DIR', None)
+        result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=environment, stdout=subprocess.PIPE,
+                                universal_newlines=True, check=True)
+        directory = result.stdout.strip()
+        self.addCleanup(shutil.rmtree, directory)
+
+        self.assertEqual(len(os.listdir(directory)), 1)
+        assert 'mirror_http_requests_total{route="/",status="200"} 1' in Metrics(directory).dump_text()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import datetime
+import unittest
+from unittest import mock
+
+from api_service.objects.event import Event
+from api_service.objects.event_store import EventStore
+from api_service.objects.recurrence import Recurrence, DAILY, WEEKLY, MONTHLY, YEARLY, DAYS_CACHED_PER_RULE, \
+    iter_occurrence_starts, get_occurrence_starts, get_last_occurrence_start
+
+
+def naive_starts(recurrence, dtstart, window_start, window_end):
+    # Reference expansion walking the whole series from the first occurrence
+    starts = list(iter_occurrence_starts(recurrence, dtstart, dtstart, window_end))
+    return [start for start in starts if start >= window_start]
+
+
+class TestRecurrence(unittest.TestCase):
+
+    def setUp(self):
+        self.dtstart = datetime.datetime(2016, 1, 31, 9, 0)
+        self.hour = datetime.timedelta(hours=1)
+
+    def test_from_rrule(self):
+        recurrence = Recurrence.from_rrule("RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=10;WKST=MO")
+        self.assertEqual(recurrence, Recurrence(WEEKLY, interval=2, count=10, weekdays=[0, 2]))
+
+        recurrence = Recurrence.from_rrule("FREQ=DAILY;UNTIL=20160301T000000")
+        self.assertEqual(recurrence.until, datetime.datetime(2016, 3, 1))
+
+    def test_from_rrule_reads_utc_until_as_local_time(self):
+        recurrence = Recurrence.from_rrule("FREQ=DAILY;UNTIL=20160301T090000Z")
+        expected = datetime.datetime(2016, 3, 1, 9, tzinfo=datetime.timezone.utc).astimezone().replace(tzinfo=None)
+        self.assertEqual(recurrence.until, expected)
+
+    def test_date_only_until_includes_that_day(self):
+        recurrence = Recurrence.from_rrule("FREQ=DAILY;UNTIL=20160202")
+        starts = list(iter_occurrence_starts(recurrence, self.dtstart, self.dtstart, datetime.datetime(2016, 3, 1)))
+        self.assertEqual([start.day for start in starts], [31, 1, 2])
+
+    def test_from_rrule_rejects_unsupported_rules(self):
+        with self.assertRaises(ValueError):
+            Recurrence.from_rrule("FREQ=MONTHLY;BYSETPOS=-1")
+        with self.assertRaises(ValueError):
+            Recurrence.from_rrule("INTERVAL=2")
+        with self.assertRaises(AssertionError):
+            Recurrence.from_rrule("FREQ=HOURLY")
+
+    def test_daily(self):
+        starts = list(get_occurrence_starts(Recurrence(DAILY, interval=3), self.dtstart, self.hour,
+                                            datetime.datetime(2016, 2, 5), datetime.datetime(2016, 2, 12)))
+        self.assertEqual([start.day for start in starts], [6, 9])
+
+    def test_weekly_by_day_with_count(self):
+        recurrence = Recurrence(WEEKLY, weekdays=[0, 4], count=3)
+        starts = list(iter_occurrence_starts(recurrence, datetime.datetime(2016, 3, 2, 9), datetime.datetime(2016, 1, 1),
+                                             datetime.datetime(2017, 1, 1)))
+        self.assertEqual([start.date() for start in starts],
+                         [datetime.date(2016, 3, 4), datetime.date(2016, 3, 7), datetime.date(2016, 3, 11)])
+
+    def test_monthly_skips_short_months(self):
+        starts = list(iter_occurrence_starts(Recurrence(MONTHLY, count=4), self.dtstart, self.dtstart,
+                                             datetime.datetime(2017, 1, 1)))
+        self.assertEqual([start.month for start in starts], [1, 3, 5, 7])
+
+    def test_yearly_leap_day(self):
+        starts = list(iter_occurrence_starts(Recurrence(YEARLY), datetime.datetime(2016, 2, 29),
+                                             datetime.datetime(2016, 1, 1), datetime.datetime(2025, 1, 1)))
+        self.assertEqual([start.year for start in starts], [2016, 2020, 2024])
+
+    def test_jumping_matches_walking_the_series(self):
+        rules = [
+            Recurrence(DAILY, interval=2),
+            Recurrence(WEEKLY, interval=3, weekdays=[1, 5, 6], count=40),
+            Recurrence(MONTHLY, interval=2),
+            Recurrence(MONTHLY, count=20),
+            Recurrence(WEEKLY, until=datetime.datetime(2017, 6, 1)),
+        ]
+        for recurrence in rules:
+            for months_ahead in (0, 5, 17, 60):
+                window_start = self.dtstart + datetime.timedelta(days=30 * months_ahead + 3)
+                window_end = window_start + datetime.timedelta(days=45)
+                self.assertEqual(list(iter_occurrence_starts(recurrence, self.dtstart, window_start, window_end)),
+                                 naive_starts(recurrence, self.dtstart, window_start, window_end),
+                                 "{0} {1}".format(recurrence, months_ahead))
+
+    def test_far_future_window_does_not_expand_history(self):
+        starts = list(get_occurrence_starts(Recurrence(DAILY), self.dtstart, self.hour,
+                                            datetime.datetime(2999, 1, 1), datetime.datetime(2999, 1, 3)))
+        self.assertEqual(len(starts), 2)
+
+    def test_store_expands_recurring_events_in_window(self):
+        standup = Event(self.dtstart, self.dtstart + self.hour, 'Standup',
+                        recurrence=Recurrence.from_rrule("FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"))
+        lunch = Event(datetime.datetime(2016, 3, 22, 12), datetime.datetime(2016, 3, 22, 13), 'Lunch')
+        store = EventStore([standup, lunch])
+
+        events = store.get_events_on(datetime.date(2016, 3, 22))
+        self.assertEqual([(event.title, event.start.hour) for event in events], [('Standup', 9), ('Lunch', 12)])
+        assert not events[0].is_recurring()
+
+        self.assertEqual(store.get_events_on(datetime.date(2016, 3, 26)), [])
+
+    def test_last_occurrence_start(self):
+        self.assertIsNone(get_last_occurrence_start(Recurrence(DAILY), self.dtstart))
+        self.assertEqual(get_last_occurrence_start(Recurrence(WEEKLY, count=3), self.dtstart),
+                         datetime.datetime(2016, 2, 14, 9))
+        self.assertEqual(get_last_occurrence_start(Recurrence(MONTHLY, count=3), self.dtstart),
+                         datetime.datetime(2016, 5, 31, 9))
+        until = datetime.datetime(2016, 2, 3)
+        self.assertEqual(get_last_occurrence_start(Recurrence(DAILY, count=100, until=until), self.dtstart), until)
+
+    def test_store_skips_finished_series(self):
+        finished = Event(self.dtstart, self.dtstart + self.hour, 'Course',
+                         recurrence=Recurrence(WEEKLY, count=3))
+        ongoing = Event(self.dtstart, self.dtstart + self.hour, 'Standup', recurrence=Recurrence(DAILY))
+        store = EventStore([finished, ongoing])
+
+        self.assertEqual([event.title for event in store.get_events_on(datetime.date(2016, 2, 14))],
+                         ['Course', 'Standup'])
+        self.assertEqual([event.title for event in store.get_events_on(datetime.date(2016, 2, 21))], ['Standup'])
+
+        assert store.remove(finished)
+        self.assertEqual([event.title for event in store.get_events_on(datetime.date(2016, 2, 14))], ['Standup'])
+        self.assertEqual(store.get_size(), 1)
+
+    def test_many_open_rules_stay_expanded_between_queries(self):
+        minute = datetime.timedelta(minutes=1)
+        rules = [Event(self.dtstart + i * minute, self.dtstart + i * minute + self.hour, 'Rule {0}'.format(i),
+                       recurrence=Recurrence(DAILY, interval=1 + i % 7)) for i in range(3000)]
+        store = EventStore(rules)
+        now = datetime.datetime(2016, 3, 22, 8, 0)
+        upcoming = store.get_upcoming(now, 24)
+        assert upcoming
+
+        # Every rule keeps its own days, so none were pushed out by the others
+        with mock.patch('api_service.objects.recurrence.iter_occurrence_starts', side_effect=AssertionError):
+            self.assertEqual(store.get_upcoming(now + datetime.timedelta(minutes=1), 24), upcoming)
+
+    def test_expansion_cache_is_bounded_per_rule(self):
+        recurrence = Recurrence(DAILY)
+        for days in range(30):
+            window_start = self.dtstart + datetime.timedelta(days=days)
+            list(get_occurrence_starts(recurrence, self.dtstart, self.hour, window_start, window_start + self.hour))
+        self.assertEqual(len(recurrence._expanded), DAYS_CACHED_PER_RULE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import json
+import unittest
+
+from api_service.responses import json_response
+from api_service.responses.assertion_failure_response import assertion_failure_response
+from api_service.responses.bad_response import bad_response
+from api_service.responses.invalid_permissions_response import invalid_permissions_response
+from api_service.responses.json_response import set_json_encoder, streamed_json_list
+
+
+class TestResponses(unittest.TestCase):
+
+    def tearDown(self):
+        set_json_encoder(None)
+
+    def assert_json(self, response, status, data):
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response.headers['Content-type'], "application/json")
+        self.assertEqual(int(response.headers['Content-length']), len(response.get_data()))
+        self.assertEqual(json.loads(response.get_data()), data)
+
+    def test_bad_response(self):
+        self.assert_json(bad_response("Missing team"), 400, {"message": "Missing team"})
+        self.assert_json(bad_response("Missing team"), 400, {"message": "Missing team"})
+
+    def test_bad_response_keeps_equal_messages_of_other_types_apart(self):
+        # True == 1 == 1.0, so compare the encoded bodies rather than decoded data
+        self.assertEqual([bad_response(message).get_data() for message in (True, 1.0, (True,), (1,))],
+                         [b'{"message":true}', b'{"message":1.0}', b'{"message":[true]}', b'{"message":[1]}'])
+
+    def test_bad_response_with_unhashable_message(self):
+        self.assert_json(bad_response(["Missing team", "Missing date"]), 400,
+                         {"message": ["Missing team", "Missing date"]})
+
+    def test_invalid_permissions_response(self):
+        self.assert_json(invalid_permissions_response("Denied", ["admin"]), 400,
+                         {"message": "Denied", "permissions": ["admin"]})
+
+    def test_assertion_failure_response_builds_new_response_each_call(self):
+        first = assertion_failure_response()
+        second = assertion_failure_response()
+        assert first is not second
+        self.assert_json(first, 500, json.loads(second.get_data()))
+        assert "TAS" in json.loads(first.get_data())['message']
+
+    def test_pluggable_encoder(self):
+        set_json_encoder(lambda data: json.dumps(data, sort_keys=True, indent=1))
+        response = json_response.json_response({"b": 1, "a": 2})
+        self.assertEqual(response.get_data(), b'{\n "a": 2,\n "b": 1\n}')
+
+    def test_changing_encoder_clears_cached_bodies(self):
+        bad_response("Missing team")
+        assertion_failure_response()
+
+        set_json_encoder(lambda data: json.dumps(data, indent=1))
+        assert b'\n' in bad_response("Missing team").get_data()
+        assert b'\n' in assertion_failure_response().get_data()
+
+    def test_streamed_json_list(self):
+        for count in (0, 1, 3, 10):
+            response = streamed_json_list(({"index": i} for i in range(count)), chunk_size=3)
+            assert response.is_streamed
+            self.assertEqual(json.loads(response.get_data()), [{"index": i} for i in range(count)])
+
+
+if __name__ == '__main__':
+    unittest.main()
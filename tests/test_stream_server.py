@@ -0,0 +1,86 @@
+import socket
+import threading
+import time
+import unittest
+
+from api_service.broadcast import Broadcaster
+from api_service.stream_server import StreamServer
+
+DISPLAYS = 1000
+
+
+def read_until(connection, marker, timeout=5):
+    connection.settimeout(timeout)
+    data = b''
+    while marker not in data:
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class TestStreamServer(unittest.TestCase):
+
+    def setUp(self):
+        self.broadcaster = Broadcaster()
+        self.broadcaster.publish('clock', {}, b"event: clock\ndata: {}\n\n")
+        self.server = StreamServer(self.broadcaster, host='127.0.0.1', heartbeat=0.2)
+        self.server.start()
+        self.addCleanup(self.server.stop, 5)
+        self.connections = []
+        self.addCleanup(self.close_connections)
+
+    def close_connections(self):
+        for connection in self.connections:
+            connection.close()
+
+    def connect(self, path=b"/stream"):
+        connection = socket.create_connection(('127.0.0.1', self.server.get_port()))
+        connection.sendall(b"GET " + path + b" HTTP/1.1\r\nHost: mirror\r\n\r\n")
+        self.connections.append(connection)
+        return connection
+
+    def wait_for_clients(self, count):
+        deadline = time.monotonic() + 10
+        while self.server.get_client_count() < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.get_client_count(), count)
+
+    def test_new_display_gets_latest_frames(self):
+        data = read_until(self.connect(), b"event: clock")
+        assert data.startswith(b"HTTP/1.1 200 OK\r\n")
+        assert b"Content-Type: text/event-stream" in data
+        assert b"retry:" in data
+
+    def test_other_paths_are_not_found(self):
+        data = read_until(self.connect(b"/"), b"\r\n\r\n")
+        assert data.startswith(b"HTTP/1.1 404 Not Found")
+
+    def test_idle_display_gets_keepalives(self):
+        connection = self.connect()
+        read_until(connection, b"event: clock")
+        assert b": keepalive" in read_until(connection, b": keepalive")
+
+    def test_thousands_of_displays_share_the_server_threads(self):
+        threads = threading.active_count()
+        for i in range(DISPLAYS):
+            self.connect()
+        self.wait_for_clients(DISPLAYS)
+        self.assertEqual(threading.active_count(), threads)
+
+        self.broadcaster.publish('agenda', {"version": 1}, b"event: agenda\ndata: {\"version\": 1}\n\n")
+        for connection in self.connections:
+            assert b"event: agenda" in read_until(connection, b"event: agenda")
+
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        deadline = time.monotonic() + 10
+        while self.server.get_client_count() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.server.get_client_count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
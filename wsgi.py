@@ -0,0 +1,6 @@
+from api_service import create_app
+
+# Only builds the app, so it is safe to import in a --preload master.
+# gunicorn.conf.py starts each worker's calendar refresh after the fork:
+#   gunicorn wsgi:application
+application = create_app()